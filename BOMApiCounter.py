@@ -0,0 +1,152 @@
+import json, time
+from contextlib import contextmanager
+
+
+def is_api_object(value):
+    """True for objects of the host's `adsk` modules, which are worth counting."""
+    return type(value).__module__.split('.', 1)[0] == 'adsk'
+
+
+def unwrap(value):
+    return value._target if isinstance(value, CountingProxy) else value
+
+
+class CountingProxy:
+    __slots__ = ('_target', '_counter')
+
+    def __init__(self, target, counter):
+        """
+        Stand-in for an `adsk` object that reports every property read, property
+        write and method call to `counter`. Objects it returns are wrapped too,
+        and wrapped arguments are unwrapped before they reach the host.
+        """
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_counter', counter)
+
+    def __getattr__(self, name):
+        target = self._target
+        counter = self._counter
+        start = time.perf_counter()
+        value = getattr(target, name)
+        if callable(value) and not isinstance(value, type):
+            return counter.method(type(target).__name__ + '.' + name + '()', value)
+        counter.add(type(target).__name__ + '.' + name, time.perf_counter() - start)
+        return counter.wrap(value)
+
+    def __setattr__(self, name, value):
+        target = self._target
+        start = time.perf_counter()
+        setattr(target, name, unwrap(value))
+        self._counter.add(type(target).__name__ + '.' + name + '=', time.perf_counter() - start)
+
+    def __iter__(self):
+        counter = self._counter
+        member = type(self._target).__name__ + '.item()'
+        items = iter(self._target)
+        while True:
+            start = time.perf_counter()
+            try:
+                value = next(items)
+            except StopIteration:
+                return
+            counter.add(member, time.perf_counter() - start)
+            yield counter.wrap(value)
+
+    def __len__(self):
+        return len(self._target)
+
+    def __getitem__(self, index):
+        return self.item(index)
+
+    def __bool__(self):
+        return bool(self._target)
+
+    def __eq__(self, other):
+        return self._target == unwrap(other)
+
+    def __ne__(self, other):
+        return self._target != unwrap(other)
+
+    def __hash__(self):
+        return hash(self._target)
+
+    def __repr__(self):
+        return f'CountingProxy({self._target!r})'
+
+
+class ApiCounter:
+    def __init__(self):
+        """
+        Count calls into the host object model, and the time spent in them,
+        per export phase and per `Type.member`.
+
+        Wrap the entry objects (application, design) with `wrap`; everything
+        reached through them is counted. Do not wrap objects that are passed
+        to the host's `cast` functions.
+        """
+        self.current_phase = 'other'
+        # (phase, member) -> [calls, seconds]
+        self.counts = {}
+
+    def wrap(self, value):
+        if is_api_object(value) and not isinstance(value, CountingProxy):
+            return CountingProxy(value, self)
+        return value
+
+    def add(self, member, seconds):
+        entry = self.counts.get((self.current_phase, member))
+        if entry is None:
+            self.counts[(self.current_phase, member)] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def method(self, member, func):
+        def counted(*args, **kwargs):
+            start = time.perf_counter()
+            result = func(*[unwrap(arg) for arg in args], **{key: unwrap(arg) for key, arg in kwargs.items()})
+            self.add(member, time.perf_counter() - start)
+            return self.wrap(result)
+        return counted
+
+    @contextmanager
+    def phase(self, name):
+        previous = self.current_phase
+        self.current_phase = name
+        try:
+            yield
+        finally:
+            self.current_phase = previous
+
+    def totals(self):
+        """Calls and seconds per phase."""
+        totals = {}
+        for (phase, _), (calls, seconds) in self.counts.items():
+            entry = totals.setdefault(phase, {'calls': 0, 'seconds': 0.0})
+            entry['calls'] += calls
+            entry['seconds'] += seconds
+        return totals
+
+    def report(self):
+        """One dict per phase and member, most called first."""
+        rows = [{'phase': phase, 'member': member, 'calls': calls, 'seconds': seconds}
+                for (phase, member), (calls, seconds) in self.counts.items()]
+        rows.sort(key=lambda row: (-row['calls'], row['phase'], row['member']))
+        return rows
+
+    def write(self, base_path):
+        """Write `<base_path>_api_calls.json` and return its path."""
+        path = base_path + '_api_calls.json'
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'totals': self.totals(), 'entries': self.report()}, f, indent=2)
+        return path
+
+    def summary(self, top=10):
+        """A few lines for the text command log."""
+        totals = self.totals()
+        lines = [f"API calls: {sum(entry['calls'] for entry in totals.values())}"]
+        for phase, entry in totals.items():
+            lines.append(f"  {phase}: {entry['calls']} calls, {entry['seconds']:.3f} s")
+        for row in self.report()[:top]:
+            lines.append(f"  {row['calls']:>8} {row['phase']} {row['member']}")
+        return '\n'.join(lines)
@@ -0,0 +1,139 @@
+"""
+Rebuild the CSV/HTML reports of many designs from their snapshots in parallel.
+
+    python -m ExportBOM.BOMBatchExport snapshots/ --output reports/ --workers 8
+
+Every ``*_snapshot.json`` / ``*_snapshot.json.gz`` file below the input
+directory is exported in its own worker process; a design that fails is
+reported and does not stop the others. ``batch_summary.json`` and
+``batch_summary.csv`` in the output directory list each design's outcome and
+timings. The exit status is 1 when any design failed.
+"""
+import argparse, csv, json, os, sys, time, traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .BOMExporterClass import BOMExporter
+from .BOMProfiler import percentile
+from .BOMSnapshot import Snapshot, export_reports, locate_images, report_base
+
+SNAPSHOT_SUFFIXES = ('_snapshot.json', '_snapshot.json.gz')
+
+
+def find_snapshots(directory):
+    """Snapshot files below `directory`, in a stable order."""
+    found = []
+    for parent, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith(SNAPSHOT_SUFFIXES):
+                found.append(os.path.join(parent, name))
+    return sorted(found)
+
+
+def export_one(snapshot_path, input_directory, output_directory, image_mode=None, image_workers=1,
+               editable_report='table'):
+    """
+    Export one design; runs in a worker process.
+
+    Never raises: failures are returned in the result's `error` field so one
+    broken snapshot cannot take down the batch.
+    """
+    result = {'snapshot': snapshot_path, 'design': None, 'rows': None, 'outputs': [], 'error': None,
+              'load_s': None, 'export_s': None, 'total_s': None, 'pid': os.getpid()}
+    start = time.perf_counter()
+    try:
+        snapshot = Snapshot(snapshot_path)
+        loaded = time.perf_counter()
+        result['load_s'] = loaded - start
+        result['design'] = snapshot.design
+        result['rows'] = len(snapshot.report_rows)
+
+        relative = os.path.relpath(report_base(snapshot_path), input_directory)
+        base_path = os.path.join(output_directory, relative)
+        os.makedirs(os.path.dirname(base_path), exist_ok=True)
+        result['outputs'] = export_reports(snapshot, base_path, locate_images(snapshot, snapshot_path),
+                                           image_mode, image_workers, editable_report)
+        result['export_s'] = time.perf_counter() - loaded
+    except Exception:
+        result['error'] = traceback.format_exc()
+    result['total_s'] = time.perf_counter() - start
+    return result
+
+
+def run_batch(input_directory, output_directory, workers=None, image_mode=None, image_workers=1,
+              editable_report='table'):
+    """Export every snapshot below `input_directory` and return the summary."""
+    snapshots = find_snapshots(input_directory)
+    os.makedirs(output_directory, exist_ok=True)
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(export_one, path, input_directory, output_directory, image_mode, image_workers,
+                               editable_report): path
+                   for path in snapshots}
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception:
+                # The worker process itself died (e.g. BrokenProcessPool)
+                results.append({'snapshot': futures[future], 'design': None, 'rows': None, 'outputs': [],
+                                'error': traceback.format_exc(), 'load_s': None, 'export_s': None,
+                                'total_s': None, 'pid': None})
+    results.sort(key=lambda result: result['snapshot'])
+
+    durations = sorted(result['total_s'] for result in results if not result['error'])
+    return {
+        'input': input_directory,
+        'output': output_directory,
+        'workers': workers or os.cpu_count(),
+        'designs': len(results),
+        'succeeded': len(durations),
+        'failed': len(results) - len(durations),
+        'rows': sum(result['rows'] or 0 for result in results),
+        'wall_s': time.perf_counter() - started,
+        'design_s': {'total': sum(durations), 'p50': percentile(durations, 0.5),
+                     'p90': percentile(durations, 0.9), 'max': durations[-1] if durations else 0.0},
+        'results': results,
+    }
+
+
+def write_summary(summary, output_directory):
+    """Write `batch_summary.json` and `batch_summary.csv` and return their paths."""
+    json_path = os.path.join(output_directory, 'batch_summary.json')
+    csv_path = os.path.join(output_directory, 'batch_summary.csv')
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    fields = ['snapshot', 'design', 'rows', 'load_s', 'export_s', 'total_s', 'pid', 'error']
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        for result in summary['results']:
+            # Only the exception line; the full traceback is in the JSON summary
+            error_lines = (result['error'] or '').strip().splitlines()
+            writer.writerow(dict(result, error=error_lines[-1] if error_lines else ''))
+    return json_path, csv_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m ExportBOM.BOMBatchExport', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='Directory searched for snapshot files.')
+    parser.add_argument('--output', required=True, help='Directory the reports and the summary are written to.')
+    parser.add_argument('--workers', type=int, help='Worker processes; defaults to the number of CPUs.')
+    parser.add_argument('--image-mode', choices=BOMExporter.IMAGE_MODES)
+    parser.add_argument('--image-workers', type=int, default=1, help='Image encoding threads per worker process.')
+    parser.add_argument('--editable-report', choices=BOMExporter.EDITABLE_REPORTS, default='table')
+    args = parser.parse_args(argv)
+
+    summary = run_batch(args.input, args.output, args.workers, args.image_mode, args.image_workers,
+                        args.editable_report)
+    write_summary(summary, args.output)
+    for result in summary['results']:
+        if result['error']:
+            print(f"FAILED {result['snapshot']}:\n{result['error']}", file=sys.stderr)
+    print(f"{summary['succeeded']}/{summary['designs']} designs exported in {summary['wall_s']:.2f} s "
+          f"({summary['design_s']['total']:.2f} s of work, {summary['workers']} workers)")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,15 +1,713 @@
-import adsk.core, adsk.fusion, traceback, time, csv, os, base64, shutil
+import traceback, time, os, base64, shutil, tempfile, threading, queue
+try:
+    import adsk.core, adsk.fusion
+except ImportError:
+    # The report writers also run without Fusion, from a snapshot (BOMSnapshot)
+    adsk = None
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from .BOMSpriteAtlas import SpriteAtlas
+from .BOMPipeline import CsvSink, EditableHtmlSink, EmbeddedImage, ExportPipeline, HtmlSink, VirtualEditableHtmlSink
 
 
 
+def solid_volume(comp):
+    volume = 0
+    for body in comp.bRepBodies:
+        if body.isSolid:
+            volume += body.volume
+    return volume
+
+
+def material_name(comp):
+    material = comp.material
+    return material.name if material and material.name else "Not Assigned"
+
+
+def body_count(comp):
+    return comp.bRepBodies.count
+
+
+_UNSET = object()
+
+
+class BomRow:
+    """
+    One BOM line: component id, name, instance count and scalar columns.
+
+    Rows filled by `read_columns` are snapshots: name, material and (optionally)
+    volume are read from the component once, during collection, so writers
+    never go back to the host. No reference to the component is kept;
+    `component` looks it up again by id through `resolve` when it is really
+    needed. Columns missing from the snapshot, such as the body count, are
+    computed that way the first time they are read with `row[column]`.
+    """
+    __slots__ = ('id', 'name', 'instances', '_mat', '_volume', '_bodies', '_resolve')
+
+    LAZY_COLUMNS = {
+        'volume': solid_volume,
+        'mat': material_name,
+        'bodies': body_count,
+    }
+
+    def __init__(self, id, name, instances, resolve):
+        self.id = id
+        self.name = name
+        self.instances = instances
+        self._mat = self._volume = self._bodies = _UNSET
+        self._resolve = resolve
+
+    def read_columns(self, comp, include_volume=False):
+        """
+        Snapshot the remaining columns of `comp`, the row's component, in one
+        pass over its properties. Returns the row.
+        """
+        material = comp.material
+        self._mat = (material.name if material else None) or "Not Assigned"
+        self._volume = solid_volume(comp) if include_volume else None
+        return self
+
+    @property
+    def component(self):
+        return self._resolve(self.id)
+
+    def __getitem__(self, key):
+        if key in ('id', 'name', 'instances', 'component'):
+            return getattr(self, key)
+        compute = self.LAZY_COLUMNS.get(key)
+        if compute is None:
+            raise KeyError(key)
+        value = getattr(self, '_' + key)
+        if value is _UNSET:
+            value = compute(self.component)
+            setattr(self, '_' + key, value)
+        return value
+
+    def __setitem__(self, key, value):
+        if key in ('name', 'instances'):
+            setattr(self, key, value)
+        elif key in self.LAZY_COLUMNS:
+            setattr(self, '_' + key, value)
+        else:
+            raise KeyError(key)
+
+    def __repr__(self):
+        return f"BomRow({self.id!r}, {self.name!r}, {self.instances!r})"
+
+
+class BomLine:
+    """
+    A line of the multi-level BOM: the BomRow of a component placed `quantity`
+    times under its parent at `level` (1 for top-level occurrences), which
+    makes `instances` copies along its whole path from the root.
+    """
+    __slots__ = ('row', 'level', 'quantity', 'instances')
+
+    def __init__(self, row, level, quantity, instances):
+        self.row = row
+        self.level = level
+        self.quantity = quantity
+        self.instances = instances
+
+    @property
+    def id(self):
+        return self.row.id
+
+    @property
+    def name(self):
+        return self.row.name
+
+    @property
+    def component(self):
+        return self.row.component
+
+    def __getitem__(self, key):
+        if key in ('level', 'quantity', 'instances'):
+            return getattr(self, key)
+        return self.row[key]
+
+
+class BomAggregator:
+    def __init__(self, include_volume=False, resolve=None, profiler=None):
+        """
+        Collect unique components into BOM rows keyed by component id.
+
+        :param include_volume: Whether rows report the solid volume.
+        :param resolve: Looks a component up by id for the rows, usually
+            `design.allComponents.itemById`. Defaults to the first component's design.
+        :param profiler: Optional ExportProfiler that gets a `row_snapshot` sample per new row.
+        """
+        self.include_volume = include_volume
+        self.resolve = resolve
+        self.profiler = profiler
+        self._rows = {}
+        # component id -> [(child component, placements)], shared by the tree walks
+        self._children = {}
+        self._structures = {}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, comp):
+        """`comp` may be a component or a component id."""
+        return (comp if isinstance(comp, str) else comp.id) in self._rows
+
+    def add(self, comp, count=1):
+        """
+        Count `count` instances of `comp`, snapshotting its row on first sight.
+
+        Rows keep the order in which components were first added.
+        """
+        comp_id = comp.id
+        row = self.count(comp_id, count)
+        if row is None:
+            row = self.add_row(BomRow(comp_id, comp.name, count, self.resolver(comp)), comp)
+        return row
+
+    def count(self, comp_id, count=1):
+        """
+        Count `count` more instances of a component that already has a row.
+        Returns the row, or None when `comp_id` has not been added yet.
+        """
+        row = self._rows.get(comp_id)
+        if row is not None:
+            row.instances += count
+        return row
+
+    def add_row(self, row, comp):
+        """
+        Add the new `row` of `comp`, made with `resolver(comp)`, reading its
+        remaining columns now. Rows keep the order in which they were added.
+        """
+        if self.profiler is not None:
+            start = time.perf_counter()
+        row.read_columns(comp, self.include_volume)
+        if self.profiler is not None:
+            self.profiler.record('row_snapshot', time.perf_counter() - start, row.name)
+        self._rows[row.id] = row
+        return row
+
+    def resolver(self, comp):
+        """The component lookup for new rows; defaults to the design of `comp`."""
+        if self.resolve is None:
+            self.resolve = comp.parentDesign.allComponents.itemById
+        return self.resolve
+
+    def add_tree(self, root):
+        """
+        Count every component below `root` without flattening the assembly.
+
+        Each component definition is walked once through `Component.occurrences`;
+        its subtree counts are memoized and multiplied by the number of times it
+        is placed, so the cost follows unique components rather than occurrences.
+        Components without a name are not listed but their children still are.
+        """
+        for comp_id, (comp, count) in self._subtree_counts(root, {}).items():
+            name = comp.name
+            if name:
+                self.add_row(BomRow(comp_id, name, count, self.resolver(comp)), comp)
+
+    def _direct_children(self, comp):
+        """Return `comp`'s child components with their number of placements, read once per definition."""
+        children = self._children.get(comp.id)
+        if children is not None:
+            return children
+
+        grouped = {}
+        for occ in comp.occurrences:
+            child = occ.component
+            if child is None:
+                continue
+            entry = grouped.get(child.id)
+            if entry is None:
+                grouped[child.id] = [child, 1]
+            else:
+                entry[1] += 1
+
+        children = self._children[comp.id] = [(child, placed) for child, placed in grouped.values()]
+        return children
+
+    def _subtree_counts(self, comp, memo):
+        counts = memo.get(comp.id)
+        if counts is not None:
+            return counts
+
+        counts = {}
+        for child, placed in self._direct_children(comp):
+            self._merge_count(counts, child.id, child, placed)
+            for grand_id, (grand, below) in self._subtree_counts(child, memo).items():
+                self._merge_count(counts, grand_id, grand, placed * below)
+
+        memo[comp.id] = counts
+        return counts
+
+    def indented_rows(self, root):
+        """
+        Return the multi-level BOM below `root` as BomLine rows, depth first.
+
+        Each sub-assembly's structure is rolled up once and reused, scaled by
+        the quantity above it, wherever it is placed. Call `add_tree(root)`
+        first: lines share its rows, and unnamed components get no line.
+        """
+        lines = []
+        for level, comp_id, quantity, instances in self._structure(root):
+            row = self._rows.get(comp_id)
+            if row is not None:
+                lines.append(BomLine(row, level, quantity, instances))
+        return lines
+
+    def _structure(self, comp):
+        """(relative level, component id, quantity, rolled-up instances) for every line below `comp`."""
+        structure = self._structures.get(comp.id)
+        if structure is not None:
+            return structure
+
+        entries = []
+        for child, placed in self._direct_children(comp):
+            entries.append((1, child.id, placed, placed))
+            for level, grand_id, quantity, instances in self._structure(child):
+                entries.append((level + 1, grand_id, quantity, placed * instances))
+
+        structure = self._structures[comp.id] = tuple(entries)
+        return structure
+
+    @staticmethod
+    def _merge_count(counts, comp_id, comp, count):
+        entry = counts.get(comp_id)
+        if entry is None:
+            counts[comp_id] = (comp, count)
+        else:
+            counts[comp_id] = (comp, entry[1] + count)
+
+    def rows(self):
+        return list(self._rows.values())
+
+
+class ImagePayloadCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        """
+        Base64 payloads of thumbnail images, encoded once per export and shared
+        by every writer.
+
+        Payloads are held in memory up to `max_bytes`; beyond that they are
+        spilled to a temporary directory and read back when needed. Images
+        asked for only once are encoded with `keep=False` and not stored at
+        all. Safe to use from several threads.
+        """
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._spilled = {}
+        self._spill_directory = None
+
+    def get(self, image_path, keep=True):
+        """
+        Return the base64 text of `image_path`, or '' if there is no image.
+
+        :param keep: Store the payload for later calls; pass False for an image that will not be asked for again.
+        """
+        key = os.path.normpath(image_path)
+        with self._lock:
+            payload = self._memory.get(key)
+            if payload is not None:
+                self._memory.move_to_end(key)
+                return payload
+            spill_path = self._spilled.get(key)
+
+        if spill_path is not None:
+            with open(spill_path, 'r', encoding='ascii') as f:
+                return f.read()
+
+        payload = BOMExporter.encode_image_to_base64(image_path) if os.path.exists(image_path) else ''
+        if payload and keep:
+            self._put(key, payload)
+        return payload
+
+    def _put(self, key, payload):
+        with self._lock:
+            if key in self._memory or key in self._spilled:
+                return
+            if self._memory_bytes + len(payload) <= self.max_bytes:
+                self._memory[key] = payload
+                self._memory_bytes += len(payload)
+                return
+
+            if self._spill_directory is None:
+                self._spill_directory = tempfile.mkdtemp(prefix='ExportBOM-')
+            spill_path = os.path.join(self._spill_directory, f"{len(self._spilled)}.b64")
+            with open(spill_path, 'w', encoding='ascii') as f:
+                f.write(payload)
+            self._spilled[key] = spill_path
+
+    def prefetch(self, image_paths, workers=4, max_in_flight=32, keep=True):
+        """
+        Yield the payload of each path in `image_paths`, in order, while up to
+        `max_in_flight` later images are read and encoded on `workers` threads.
+        A None path yields ''. `keep` is passed on to `get`.
+        """
+        if workers <= 1:
+            for image_path in image_paths:
+                yield self.get(image_path, keep) if image_path is not None else ''
+            return
+
+        image_paths = iter(image_paths)
+        pending = deque()
+
+        def submit(pool):
+            for image_path in image_paths:
+                pending.append(pool.submit(self.get, image_path, keep) if image_path is not None else None)
+                return
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ExportBOM-images') as pool:
+            for _ in range(max_in_flight):
+                submit(pool)
+            while pending:
+                future = pending.popleft()
+                submit(pool)
+                yield future.result() if future is not None else ''
+
+    def discard(self, image_path):
+        """Forget `image_path`, e.g. because the image was just re-rendered."""
+        key = os.path.normpath(image_path)
+        with self._lock:
+            payload = self._memory.pop(key, None)
+            if payload is not None:
+                self._memory_bytes -= len(payload)
+            spill_path = self._spilled.pop(key, None)
+        if spill_path is not None and os.path.exists(spill_path):
+            os.remove(spill_path)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self._spilled.clear()
+            if self._spill_directory is not None:
+                shutil.rmtree(self._spill_directory, ignore_errors=True)
+                self._spill_directory = None
+
+
+_END = object()
+_ABORT = object()
+
+
+class ReportStream:
+    def __init__(self, writers, rows, max_queued=256):
+        """
+        Feed `rows`, in order, to report writers running on their own threads,
+        each through a bounded queue, so reports are written while the images
+        are still being taken.
+
+        A row is handed over once `ready` has been called for its component id,
+        i.e. once its image exists. Writers must not touch the Fusion API.
+
+        :param writers: Callables that write one report from an iterable of rows.
+        :param rows: The rows the reports list, in report order.
+        :param max_queued: Rows a writer may fall behind before `ready` waits for it.
+        """
+        self._writers = writers
+        self._rows = list(rows)
+        self._next = 0
+        self._ready = set()
+        self._queues = [queue.Queue(max_queued) for _ in writers]
+        self._threads = []
+        self._errors = []
+        self._stopped = False
+
+    def start(self):
+        for index, writer in enumerate(self._writers):
+            thread = threading.Thread(target=self._consume, args=(writer, self._queues[index]),
+                                      name=f'ExportBOM-report-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def ready(self, comp_id):
+        """Mark the image of `comp_id` as written and pass on every row that can now go out."""
+        self._ready.add(comp_id)
+        rows = self._rows
+        while self._next < len(rows) and rows[self._next].id in self._ready:
+            self._put(rows[self._next])
+            self._next += 1
+
+    def finish(self):
+        """Pass on the remaining rows, wait for the writers and re-raise the first writer error."""
+        for row in self._rows[self._next:]:
+            self._put(row)
+        self._next = len(self._rows)
+        self._stop(_END)
+        if self._errors:
+            raise self._errors[0]
+
+    def abort(self):
+        """Stop the writers without finishing the reports; does nothing once they have stopped."""
+        if not self._stopped:
+            self._stop(_ABORT)
+
+    def _put(self, row):
+        for row_queue in self._queues:
+            row_queue.put(row)
+
+    def _stop(self, marker):
+        self._stopped = True
+        self._put(marker)
+        for thread in self._threads:
+            thread.join()
+
+    @staticmethod
+    def _iterate(row_queue):
+        while True:
+            row = row_queue.get()
+            if row is _END or row is _ABORT:
+                # Leave the marker for whoever reads next
+                row_queue.put(row)
+                if row is _ABORT:
+                    raise RuntimeError('Report writing was aborted')
+                return
+            yield row
+
+    def _consume(self, writer, row_queue):
+        try:
+            writer(self._iterate(row_queue))
+        except Exception as e:
+            self._errors.append(e)
+        finally:
+            # A writer that stopped early must not leave the producer blocked on its queue
+            try:
+                for _ in self._iterate(row_queue):
+                    pass
+            except RuntimeError:
+                pass
+
+
+class Shot:
+    """
+    The occurrence a component is photographed through, with what the
+    renderer needs from it read once: the id of its component, the camera
+    target at its translation and the referenced assembly context it has to
+    be shown in, if any.
+    """
+    __slots__ = ('occurrence', 'component_id', 'target', 'context', 'context_path', '_path')
+
+    def __init__(self, occurrence, component_id):
+        self.occurrence = occurrence
+        self.component_id = component_id
+        translation = occurrence.transform.translation
+        self.target = adsk.core.Point3D.create(translation.x, translation.y, translation.z)
+        context = occurrence.assemblyContext
+        if context and context.isReferencedComponent:
+            self.context, self.context_path = context, context.fullPathName
+        else:
+            # Isolated on its own; grouped before the referenced contexts
+            self.context, self.context_path = None, ''
+        self._path = None
+
+    @property
+    def path(self):
+        """Full path of the occurrence, read on first use."""
+        if self._path is None:
+            self._path = self.occurrence.fullPathName
+        return self._path
+
+
+class VisibilityManager:
+    def __init__(self, top_level_occurrences):
+        """
+        Isolate components for a series of thumbnail shots, changing only what
+        differs from the previous shot, and put everything back once in `restore`.
+
+        :param top_level_occurrences: The root component's occurrences; which of
+            them are visible is recorded up front.
+        """
+        self._visible_top_level = [occ for occ in top_level_occurrences if occ.isLightBulbOn]
+        self._isolated = None
+        self._isolated_path = None
+        self._context = None
+        self._context_path = None
+        # component id -> component whose bodies folder was switched off inside the context
+        self._hidden = {}
+        self._target = None
+
+    def show(self, shot, component):
+        """Make `component`, as placed by the Shot's occurrence, the only visible geometry."""
+        component_id = shot.component_id
+        context = shot.context
+        if context is not None:
+            path = shot.context_path
+            if path != self._context_path:
+                self._leave()
+                context.isIsolated = True
+                self._context, self._context_path = context, path
+                for child_occurrence in context.component.allOccurrences:
+                    child = child_occurrence.component
+                    child_id = child.id
+                    if child_id != component_id and child_id not in self._hidden and child.isBodiesFolderLightBulbOn:
+                        child.isBodiesFolderLightBulbOn = False
+                        self._hidden[child_id] = child
+            else:
+                # Same context as the previous shot: only swap which bodies are shown.
+                shown = self._hidden.pop(component_id, None)
+                if shown is not None:
+                    shown.isBodiesFolderLightBulbOn = True
+                if self._target is not None:
+                    previous, previous_id = self._target
+                    if previous_id != component_id and previous.isBodiesFolderLightBulbOn:
+                        previous.isBodiesFolderLightBulbOn = False
+                        self._hidden[previous_id] = previous
+            self._target = (component, component_id)
+        else:
+            path = shot.path
+            if path != self._isolated_path:
+                self._leave()
+                shot.occurrence.isIsolated = True
+                self._isolated, self._isolated_path = shot.occurrence, path
+
+    def _leave(self):
+        if self._context is not None:
+            self._context.isIsolated = False
+            for child in self._hidden.values():
+                child.isBodiesFolderLightBulbOn = True
+            self._hidden.clear()
+            self._context = self._context_path = self._target = None
+        if self._isolated is not None:
+            self._isolated.isIsolated = False
+            self._isolated = self._isolated_path = None
+
+    def restore(self):
+        self._leave()
+        BOMExporter.Unisolate(self._visible_top_level)
+
+
+class RenderSession:
+    def __init__(self, app, ui, width=128, height=128):
+        """
+        Context manager that prepares the viewport for a series of thumbnail
+        shots: the layout grid is hidden and the camera settings are made once
+        on entry, and the original grid and camera are put back on exit, also
+        when an exception leaves the block.
+
+        :param width: Width of the saved images in pixels.
+        :param height: Height of the saved images in pixels.
+        """
+        self.app = app
+        self.ui = ui
+        self.width = width
+        self.height = height
+        self._viewport = None
+        self._camera = None
+        self._original_camera = None
+        self._grid_item = None
+        self._grid_was_on = None
+
+    @staticmethod
+    def grid_item(ui):
+        """The list item that switches the layout grid on and off."""
+        cmdDef = ui.commandDefinitions.itemById('ViewLayoutGridCommand')
+        listCntrlDef = adsk.core.ListControlDefinition.cast(cmdDef.controlDefinition)
+        return listCntrlDef.listItems.item(0)
+
+    def __enter__(self):
+        self._viewport = self.app.activeViewport
+        self._original_camera = self._viewport.camera
+        self._grid_item = self.grid_item(self.ui)
+        self._grid_was_on = self._grid_item.isSelected
+        if self._grid_was_on:
+            self._grid_item.isSelected = False
+
+        self._camera = self._viewport.camera
+        self._camera.isFitView = True
+        self._camera.isSmoothTransition = False
+        return self
+
+    def capture(self, camera_target, image_path):
+        """Point the camera at `camera_target` and save the viewport to `image_path`."""
+        camera = self._camera
+        camera.target = camera_target
+        camera.eye = adsk.core.Point3D.create(100 + camera_target.x, -100 + camera_target.y, 100 + camera_target.z)
+        viewport = self._viewport
+        viewport.camera = camera
+        viewport.refresh()
+        adsk.doEvents()
+
+        # An older file may be a hard link into the thumbnail cache
+        if os.path.exists(image_path):
+            os.remove(image_path)
+        return viewport.saveAsImageFile(image_path, self.width, self.height)
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if self._original_camera is not None:
+            self._viewport.camera = self._original_camera
+            self._viewport.refresh()
+        if self._grid_was_on:
+            self._grid_item.isSelected = True
+        self._viewport = self._camera = self._original_camera = self._grid_item = None
+        return False
+
+
 class BOMExporter:
-    def __init__(self, include_volume=False):
+    IMAGE_MODES = ('inline', 'inline_streamed', 'atlas', 'atlas_embedded')
+    ATLAS_MODES = ('atlas', 'atlas_embedded')
+    EDITABLE_REPORTS = ('table', 'virtual')
+
+    def __init__(self, include_volume=False, thumbnail_cache=None, image_memory_bytes=64 * 1024 * 1024,
+                 image_mode='inline', image_workers=4, image_prefetch=32, multilevel=False, editable_report='table'):
         """
         Initialize the BOMExporter.
 
         :param include_volume: Whether to include the volume in the BOM export.
+        :param thumbnail_cache: Optional ThumbnailCache reused across exports by take_image.
+        :param image_memory_bytes: Encoded images kept in memory before spilling to disk.
+        :param image_mode: How the HTML reports show thumbnails: 'inline' embeds one image per
+            row, 'inline_streamed' embeds the same but encodes each image from disk straight
+            into the report file, 'atlas' links sprite strips written to the image directory
+            and 'atlas_embedded' embeds each strip once.
+        :param image_workers: Threads reading and encoding images ahead of the HTML writers; 1 disables.
+        :param image_prefetch: Images prepared ahead of the row being written, bounding memory in flight.
+        :param multilevel: Whether the rows are BomLine rows of an indented BOM, which adds
+            the level and per-parent quantity columns.
+        :param editable_report: Layout of `_html_editable.html`: 'table' writes every row as an
+            editable table row, 'virtual' embeds the rows as JSON and only builds the rows in
+            view, for BOMs too large for the table.
         """
+        if image_mode not in self.IMAGE_MODES:
+            raise ValueError(f"Unknown image mode: {image_mode}")
+        if editable_report not in self.EDITABLE_REPORTS:
+            raise ValueError(f"Unknown editable report: {editable_report}")
         self.include_volume = include_volume
+        self.thumbnail_cache = thumbnail_cache
+        self.image_payloads = ImagePayloadCache(image_memory_bytes)
+        self.image_mode = image_mode
+        self.image_workers = image_workers
+        self.image_prefetch = image_prefetch
+        self.multilevel = multilevel
+        self.editable_report = editable_report
+        self._sprite_atlas = None
+        # component id -> Shot of the first occurrence seen
+        self.representatives = {}
+
+    def index_occurrence(self, occ, row):
+        """
+        Remember `occ` as the occurrence used to photograph the component of
+        `row`, its BOM row, unless one was already recorded.
+        """
+        if row.id not in self.representatives:
+            self.representatives[row.id] = Shot(occ, row.id)
+
+    def representative(self, component_id, occs=None):
+        """
+        Return the indexed Shot for the component `component_id`.
+
+        When it was not indexed during collection, `occs` is scanned up to the
+        first occurrence of the component. Returns None if there is none.
+        """
+        entry = self.representatives.get(component_id)
+        if entry is None and occs is not None:
+            for occ in occs:
+                comp = occ.component
+                if comp is not None and comp.id == component_id:
+                    entry = self.representatives[component_id] = Shot(occ, component_id)
+                    break
+        return entry
 
     @staticmethod
     def space_pad_right(value, length):
@@ -49,24 +747,32 @@ class BOMExporter:
                     os.remove(file_path)
                     print(f"Deleted file: {file_path}")
 
-    def build_csv(self, bom, image_directory, file_name):
-        with open(file_name + '.csv', 'w', encoding='utf-8', newline='') as csvfile:
-            writer = csv.writer(csvfile, quoting=csv.QUOTE_NONNUMERIC, delimiter=',')
-            base_url = 'www.example.com/images/'
-            if self.include_volume:
-                writer.writerow(['name', 'instances', 'mat', 'volume', 'image_path'])
-            else:
-                writer.writerow(['name', 'instances', 'mat', 'image_path'])
+    def columns(self):
+        """The (key, label) pairs of the data columns every writer emits, in order."""
+        if self.multilevel:
+            columns = [('level', 'Level'), ('name', 'Name'), ('quantity', 'Qty'), ('instances', 'Instances'), ('mat', 'Material')]
+        else:
+            columns = [('name', 'Name'), ('instances', 'Instances'), ('mat', 'Material')]
+        if self.include_volume:
+            columns.append(('volume', 'Volume'))
+        return columns
 
-            for item in bom:
-                name = item['name']
-                image_path = os.path.join(image_directory, f"{item['component'].id}.png")
-                image_url = f"{image_directory}/{item['component'].id}.png"
-                image_hyperlink = f'=HYPERLINK("{image_path}", "Open Image")'
-                if self.include_volume:
-                    writer.writerow([name, item['instances'], item['mat'], item['volume'], image_hyperlink])
-                else:
-                    writer.writerow([name, item['instances'], item['mat'], image_hyperlink])
+    def report_pipeline(self, image_directory, file_name, profiler=None):
+        """
+        The ExportPipeline writing `<file_name>_bom.csv`, `<file_name>_html.html`
+        and `<file_name>_html_editable.html` in one pass.
+
+        :param profiler: Optional ExportProfiler the time of each report is recorded on.
+        """
+        editable_sink = VirtualEditableHtmlSink if self.editable_report == 'virtual' else EditableHtmlSink
+        return ExportPipeline(self, image_directory, [
+            CsvSink(file_name + '_bom.csv'),
+            HtmlSink(file_name + '_html.html'),
+            editable_sink(file_name + '_html_editable.html'),
+        ], profiler=profiler)
+
+    def build_csv(self, bom, image_directory, file_name):
+        ExportPipeline(self, image_directory, [CsvSink(file_name + '.csv')]).run(bom)
 
     @staticmethod
     def encode_image_to_base64(image_path):
@@ -77,192 +783,158 @@ class BOMExporter:
             print(f"Error encoding image {image_path}: {str(e)}")
             return ''
 
-    def build_html_with_images(self, app, bom, image_directory, file_name, editable=False):
-        suffix = '_editable' if editable else ''
-        with open(file_name + suffix + '.html', 'w', encoding='utf-8') as html_file:
-            html_file.write('<html><body>\n')
-            html_file.write('<table border="1">\n')
-            
-            html_file.write('<tr><th>Name</th><th>Instances</th><th>Material</th>')
-            if self.include_volume:
-                html_file.write('<th>Volume</th>')
-            html_file.write('<th>Image</th></tr>\n')
+    def sprite_atlas(self, bom, image_directory):
+        """
+        Return the sprite atlas of the BOM thumbnails, packing it on first use,
+        or None in 'inline' image mode.
+        """
+        if self.image_mode not in self.ATLAS_MODES:
+            return None
+        if self._sprite_atlas is None or self._sprite_atlas[0] != image_directory:
+            atlas = SpriteAtlas()
+            atlas.build([f"{image_directory}/{item.id}.png" for item in bom], image_directory)
+            self._sprite_atlas = (image_directory, atlas)
+        return self._sprite_atlas[1]
+
+    def html_start(self, atlas, html_path):
+        if atlas is None or not atlas.atlases:
+            return '<html><body>\n'
+        styles = ['.bom-sprite{display:inline-block;width:50px;background-repeat:no-repeat;background-size:50px auto}']
+        for index, (atlas_path, width, height) in enumerate(atlas.atlases):
+            if self.image_mode == 'atlas_embedded':
+                url = 'data:image/png;base64,' + self.image_payloads.get(atlas_path)
+            else:
+                url = os.path.relpath(atlas_path, os.path.dirname(html_path)).replace(os.sep, '/')
+            styles.append(f'.bom-atlas-{index}{{background-image:url("{url}")}}')
+        return '<html><head><style>\n' + '\n'.join(styles) + '\n</style></head><body>\n'
 
-            for item in bom:
-                image_path = f"{image_directory}/{item['component'].id}.png"
-                image_base64 = self.encode_image_to_base64(image_path) if os.path.exists(image_path) else ''
-                html_file.write('<tr>')
+    def image_payload_stream(self, image_paths, atlas=None, keep=True):
+        """
+        Yield the base64 payload for each of `image_paths` in order, prepared
+        ahead of the caller on the image worker threads. Images held by `atlas`
+        yield '' since their cells do not need the payload. With `keep` False
+        the payloads are not stored in `image_payloads`.
+        """
+        if atlas is not None:
+            image_paths = [None if atlas.position(image_path) else image_path for image_path in image_paths]
+        return self.image_payloads.prefetch(image_paths, self.image_workers, self.image_prefetch, keep)
 
-                if editable:
-                    html_file.write(f'<td contenteditable="true">{item["name"]}</td>')
-                    html_file.write(f'<td contenteditable="true">{item["instances"]}</td>')
-                    html_file.write(f'<td contenteditable="true">{item["mat"]}</td>')
-                else:
-                    html_file.write(f'<td>{item["name"]}</td>')
-                    html_file.write(f'<td>{item["instances"]}</td>')
-                    html_file.write(f'<td>{item["mat"]}</td>')
-                
-                if self.include_volume:
-                    html_file.write(f'<td>{item["volume"]}</td>')
+    def rows_with_images(self, bom, image_directory, atlas=None):
+        """
+        Yield (item, image path, base64 payload) for each row of `bom`, which
+        may be a one-shot iterator such as a ReportStream queue. Payloads are
+        prepared ahead of the caller on the image worker threads.
 
-                if image_base64:
-                    html_file.write(f'<td><img src="data:image/png;base64,{image_base64}" alt="Image" width="50" height="50"></td>')
-                else:
-                    html_file.write('<td>Image not found</td>')
+        All sinks write from the same pass, so a flat BOM asks for each image
+        once and its payloads are not cached; a multilevel BOM repeats a
+        component on every line it appears, so those payloads are kept.
+        """
+        items = deque()
 
-                html_file.write('</tr>\n')
+        def image_paths():
+            for item in bom:
+                items.append(item)
+                yield f"{image_directory}/{item.id}.png"
 
-            html_file.write('</table>\n')
-            html_file.write('</body></html>\n')
+        for image_base64 in self.image_payload_stream(image_paths(), atlas, self.multilevel):
+            item = items.popleft()
+            yield item, f"{image_directory}/{item.id}.png", image_base64
 
+    def image_cell(self, image_path, atlas=None, image_base64=None):
+        """
+        Return the table cell showing `image_path`, taken from `atlas` when it
+        holds the image. `image_base64` saves the lookup when already known.
+        In 'inline_streamed' mode the cell is an EmbeddedImage the sinks encode
+        while writing.
+        """
+        position = atlas.position(image_path) if atlas is not None else None
+        if position is not None:
+            index, top, width, height = position
+            scale = 50 / width
+            return (f'<td><div class="bom-sprite bom-atlas-{index}" title="Image" '
+                    f'style="height:{height * scale:g}px;background-position:0 -{top * scale:g}px"></div></td>')
+
+        if self.image_mode == 'inline_streamed':
+            found = os.path.isfile(image_path) and os.path.getsize(image_path) > 0
+            return EmbeddedImage(image_path) if found else '<td>Image not found</td>'
+        if image_base64 is None:
+            image_base64 = self.image_payloads.get(image_path)
+        if image_base64:
+            return f'<td><img src="data:image/png;base64,{image_base64}" alt="Image" width="50" height="50"></td>'
+        return '<td>Image not found</td>'
+
+    def build_html_with_images(self, app, bom, image_directory, file_name, editable=False):
+        suffix = '_editable' if editable else ''
+        ExportPipeline(self, image_directory, [HtmlSink(file_name + suffix + '.html', editable)]).run(bom)
 
     def buildHTMLWithImagesEditableCSV(self, app, bom, image_directory, file_name, editable=True):
-        with open(file_name + '_editable' + '.html', 'w', encoding='utf-8') as html_file:
-            html_file.write('<html><body>\n')
-            
-            # Include a script for handling selection and exporting
-            html_file.write('''
-            <script>
-            function exportSelected() {
-                var table = document.getElementById("bomTable");
-                var selectedRows = [];
-                var checkboxes = table.getElementsByClassName("rowCheckbox");
-                for (var i = 0; i < checkboxes.length; i++) {
-                    if (checkboxes[i].checked) {
-                        var row = checkboxes[i].closest("tr");
-                        var rowData = [];
-                        var cells = row.getElementsByTagName("td");
-                        for (var j = 1; j < cells.length - 1; j++) { // Skip the image cell
-                            rowData.push(cells[j].innerText);
-                        }
-                        selectedRows.push(rowData);
-                    }
-                }
-
-                if (selectedRows.length > 0) {
-                    var csvContent = "Name,Instances,Material";
-                    if (''' + ('true' if self.include_volume else 'false') + ''') {
-                        csvContent += ",Volume";  // Include Volume if enabled
-                    }
-                    csvContent += ",Image\\n";  // Include Image column for the export
-                    
-                    selectedRows.forEach(function(row) {
-                        csvContent += row.join(",") + "\\n";  // Combine the row data
-                    });
-                    
-                    var blob = new Blob([csvContent], { type: "text/csv" });
-                    var link = document.createElement("a");
-                    link.href = URL.createObjectURL(blob);
-                    link.download = "selected_bom.csv";  // Default export file name
-                    link.click();
-                } else {
-                    alert("No rows selected for export.");
-                }
-            }
-            </script>
-            ''')
-
-            html_file.write('<table id="bomTable" border="1">\n')
-            
-            # Conditionally write the header with or without the volume column
-            html_file.write('<tr><th>Select</th><th>Name</th><th>Instances</th><th>Material</th>')
-            if self.include_volume:
-                html_file.write('<th>Volume</th>')  # Only include this if includeVolume is True
-            html_file.write('<th>Image</th></tr>\n')
-            
-            # Write the rows with editable cells and selection checkboxes
-            for item in bom:
-                image_path = f"{image_directory}/{item['component'].id}.png"
-                image_base64 = self.encode_image_to_base64(image_path) if os.path.exists(image_path) else ''
-
-                html_file.write('<tr>')
-                
-                # Selection checkbox
-                html_file.write(f'<td><input type="checkbox" class="rowCheckbox" checked="checked"></td>')
-                
-                # Editable fields (contenteditable="true")
-                html_file.write(f'<td contenteditable="true">{item["name"]}</td>')
-                html_file.write(f'<td contenteditable="true">{item["instances"]}</td>')
-                html_file.write(f'<td contenteditable="true">{item["mat"]}</td>')
-                
-                # Include volume data only if includeVolume is True
-                if self.include_volume:
-                    html_file.write(f'<td contenteditable="true">{item["volume"]}</td>')
-                
-                # Handling the image column - export either base64 or image URL
-                if image_base64:
-                    html_file.write(f'<td><img src="data:image/png;base64,{image_base64}" alt="Image" width="50" height="50"></td>')
-                else:
-                    html_file.write('<td>Image not found</td>')
-                
-                html_file.write('</tr>\n')
-            
-            html_file.write('</table>\n')
-            
-            # Export button to trigger CSV export
-            html_file.write('<button onclick="exportSelected()">Export Selected Rows</button>\n')
-            
-            html_file.write('</body></html>\n')
-
-
-    def take_image(self, app, ui, component, occs, path):
-        cameraTarget = False
-        occurrence = False
+        ExportPipeline(self, image_directory, [EditableHtmlSink(file_name + '_editable' + '.html')]).run(bom)
 
-        for occ in occs:
-            comp = occ.component
-
-            if comp == component and not cameraTarget:
-                cameraTarget = adsk.core.Point3D.create(occ.transform.translation.x, occ.transform.translation.y, occ.transform.translation.z)
-                occurrence = occ
-
-        if cameraTarget:
-            if occurrence.assemblyContext and occurrence.assemblyContext.isReferencedComponent:
-                occurrence.assemblyContext.isIsolated = True
-                
-                hiddenChildren = []
-                for childOccurrence in occurrence.assemblyContext.component.allOccurrences:
-                    hiddenChild = childOccurrence.component
-                    if hiddenChild != component and hiddenChild.isBodiesFolderLightBulbOn:
-                        hiddenChildren.append(hiddenChild)
-                        hiddenChild.isBodiesFolderLightBulbOn = False
-            else:
-                occurrence.isIsolated = True
-
-            self.setGridDisplay(False)
-
-            viewport = app.activeViewport
-            camera = viewport.camera
-            camera.target = cameraTarget
-            camera.isFitView = True
-            camera.isSmoothTransition = False
-            camera.eye = adsk.core.Point3D.create(100 + cameraTarget.x, -100 + cameraTarget.y, 100 + cameraTarget.z)
-            app.activeViewport.camera = camera
-            app.activeViewport.refresh()
-            adsk.doEvents()
-
-            # Save the image
-            image_path = os.path.join(path, f"{component.id}.png")
-            success = app.activeViewport.saveAsImageFile(image_path, 128, 128)
-            if not success:
-                ui.messageBox('Failed saving viewport image.')
-
-            if occurrence.assemblyContext and occurrence.assemblyContext.isReferencedComponent:
-                occurrence.assemblyContext.isIsolated = False  
-                for hiddenChild in hiddenChildren:
-                    hiddenChild.isBodiesFolderLightBulbOn = True
-            else:
-                occurrence.isIsolated = False
+    def capture_order(self, rows, root=None):
+        """
+        Return (row, component) pairs with the components that are photographed
+        inside the same referenced assembly context next to each other, so a
+        VisibilityManager isolates each context once.
+
+        :param root: Root component used to find occurrences of components that
+            were not indexed during collection.
+        """
+        pairs = []
+        for row in rows:
+            component = row.component
+            entry = self.representative(row.id, root.allOccurrencesByComponent(component) if root else None)
+            pairs.append((entry.context_path if entry else '', row, component))
+        pairs.sort(key=lambda pair: pair[0])
+        return [(row, component) for _, row, component in pairs]
+
+    def take_image(self, app, ui, component, occs=None, path=None, visibility=None, session=None):
+        """
+        Save a 128x128 thumbnail of `component` as `<path>/<component id>.png`.
+
+        With a VisibilityManager the isolation is left in place for the next
+        shot, and with an open RenderSession the grid and camera setup is
+        shared; without them both are set up and undone around this shot.
+
+        Returns True when the viewport was used, False when the image came from
+        the thumbnail cache or no occurrence of the component exists.
+        """
+        component_id = component.id
+        image_path = os.path.join(path, f"{component_id}.png")
+        self.image_payloads.discard(image_path)
+        self._sprite_atlas = None
+        entry = self.representative(component_id, occs)
+        if not entry:
+            return False
+
+        cache_key = None
+        if self.thumbnail_cache is not None:
+            cache_key = self.thumbnail_cache.key(component, entry.occurrence)
+            if self.thumbnail_cache.fetch(cache_key, image_path):
+                return False
+
+        # Without a shared manager the isolation only lasts for this shot
+        shot_visibility = visibility if visibility is not None else VisibilityManager(())
+        shot_visibility.show(entry, component)
+
+        if session is not None:
+            success = session.capture(entry.target, image_path)
+        else:
+            with RenderSession(app, ui) as shot_session:
+                success = shot_session.capture(entry.target, image_path)
+        if not success:
+            ui.messageBox('Failed saving viewport image.')
+        elif cache_key:
+            self.thumbnail_cache.store(cache_key, image_path)
+
+        if visibility is None:
+            shot_visibility.restore()
+        return True
 
     @staticmethod
     def setGridDisplay(turnOn):
         app = adsk.core.Application.get()
-        ui  = app.userInterface
+        layoutGridItem = RenderSession.grid_item(app.userInterface)
 
-        cmdDef = ui.commandDefinitions.itemById('ViewLayoutGridCommand')
-        listCntrlDef = adsk.core.ListControlDefinition.cast(cmdDef.controlDefinition)
-        layoutGridItem = listCntrlDef.listItems.item(0)
-        
         if turnOn:
             layoutGridItem.isSelected = True
         else:
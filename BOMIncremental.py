@@ -0,0 +1,139 @@
+import hashlib, json, os
+
+from .BOMThumbnailCache import geometry_fingerprint, placement_fingerprint
+
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExportManifest:
+    FILE_NAME = 'export_manifest.json'
+
+    def __init__(self, directory, include_volume=False, image_mode='inline', editable_report='table'):
+        """
+        Record of what the previous export into `directory` produced, used to
+        skip images and output files whose content would not change.
+
+        :param directory: The export's `_files` directory, where the manifest lives.
+        :param include_volume: Whether row content includes the volume column.
+        :param image_mode: The exporter's image mode, which changes every report.
+        :param editable_report: The exporter's editable report layout.
+        """
+        self.directory = directory
+        self.include_volume = include_volume
+        self.image_mode = image_mode
+        self.editable_report = editable_report
+        self.previous = self._load()
+        self.current = {'rows': {}, 'geometry': {}, 'images': {}, 'outputs': {}, 'digest': None}
+        self.reused = []
+        self.rendered = []
+        self.outputs_rewritten = False
+        self._fingerprints = {}
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, self.FILE_NAME)
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def add_row(self, row, component=None, occurrence=None):
+        """
+        Fingerprint a freshly collected BOM row and what its image shows.
+
+        :param component: The row's component, if the caller already has it.
+        :param occurrence: The occurrence the image is taken through; its placement
+            and appearance override change the image too.
+        """
+        values = [row['name'], row['instances'], row['mat']]
+        if self.include_volume:
+            values.append(row['volume'])
+        self.current['rows'][row.id] = hashlib.sha1(repr(values).encode('utf-8')).hexdigest()
+        # The design version is left out so saving the design does not
+        # invalidate images of components that did not change.
+        geometry = geometry_fingerprint(component or row.component, self._fingerprints, include_version=False)
+        if occurrence is not None:
+            geometry += '|' + placement_fingerprint(occurrence)
+        self.current['geometry'][row.id] = geometry
+
+    def image_is_current(self, comp_id, image_path):
+        """
+        True when the image from the previous export can be kept: the component
+        geometry is unchanged and the file on disk is the one that was written.
+        """
+        previous_hash = self.previous.get('images', {}).get(comp_id)
+        if previous_hash is None or not os.path.isfile(image_path):
+            return False
+        if self.previous.get('geometry', {}).get(comp_id) != self.current['geometry'].get(comp_id):
+            return False
+        if file_digest(image_path) != previous_hash:
+            return False
+        self.current['images'][comp_id] = previous_hash
+        self.reused.append(comp_id)
+        return True
+
+    def record_image(self, comp_id, image_path):
+        if os.path.isfile(image_path):
+            self.current['images'][comp_id] = file_digest(image_path)
+        self.rendered.append(comp_id)
+
+    def remove_stale_images(self):
+        """Delete images of components that are no longer part of the BOM."""
+        removed = 0
+        for comp_id in self.previous.get('images', {}):
+            if comp_id not in self.current['rows']:
+                image_path = os.path.join(self.directory, f"{comp_id}.png")
+                if os.path.isfile(image_path):
+                    os.remove(image_path)
+                    removed += 1
+        return removed
+
+    def content_digest(self, rows):
+        """Digest of everything the report files are built from, in row order."""
+        digest = hashlib.sha1(repr((self.include_volume, self.image_mode, self.editable_report, self.directory)).encode('utf-8'))
+        for row in rows:
+            digest.update(row.id.encode('utf-8'))
+            digest.update(self.current['rows'][row.id].encode('utf-8'))
+            # Multi-level lines add their position in the tree.
+            digest.update(repr((getattr(row, 'level', None), getattr(row, 'quantity', None), row.instances)).encode('utf-8'))
+            digest.update(self.current['images'].get(row.id, '').encode('utf-8'))
+        return digest.hexdigest()
+
+    def outputs_are_current(self, rows, output_paths):
+        """
+        True when the previous export wrote `output_paths` from identical
+        report `rows` and none of them has been modified since.
+        """
+        self.current['digest'] = self.content_digest(rows)
+        if self.previous.get('digest') != self.current['digest']:
+            return False
+        previous_outputs = self.previous.get('outputs', {})
+        for output_path in output_paths:
+            name = os.path.basename(output_path)
+            if not os.path.isfile(output_path) or previous_outputs.get(name) != file_digest(output_path):
+                return False
+        self.current['outputs'] = {os.path.basename(p): previous_outputs[os.path.basename(p)] for p in output_paths}
+        return True
+
+    def record_outputs(self, output_paths):
+        self.outputs_rewritten = True
+        self.current['outputs'] = {os.path.basename(p): file_digest(p) for p in output_paths if os.path.isfile(p)}
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.current, f)
+        os.replace(self.path + '.tmp', self.path)
+
+    def summary(self):
+        return (f"Incremental export: reused {len(self.reused)} images, rendered {len(self.rendered)}, "
+                f"reports {'rewritten' if self.outputs_rewritten else 'unchanged'}")
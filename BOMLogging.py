@@ -0,0 +1,96 @@
+import logging
+from collections import deque
+
+LEVELS = {'DEBUG': logging.DEBUG, 'INFO': logging.INFO, 'WARNING': logging.WARNING, 'ERROR': logging.ERROR}
+
+
+class AppLogHandler(logging.Handler):
+    def __init__(self, app, capacity=500, level=logging.NOTSET):
+        """
+        Collect formatted records in a bounded in-memory buffer and hand them to
+        the text command log in one `app.log` call per batch, instead of one
+        round trip into the host per message.
+
+        The buffer is flushed when it holds `capacity` records, when an error
+        is logged and when the handler is flushed or closed.
+        """
+        super().__init__(level)
+        self.app = app
+        self.capacity = capacity
+        self.buffer = deque(maxlen=capacity)
+
+    def emit(self, record):
+        try:
+            self.buffer.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+            return
+        if len(self.buffer) >= self.capacity or record.levelno >= logging.ERROR:
+            self.flush()
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.buffer:
+                self.app.log('\n'.join(self.buffer))
+                self.buffer.clear()
+        finally:
+            self.release()
+
+    def close(self):
+        self.flush()
+        super().close()
+
+
+class SampleFilter(logging.Filter):
+    def __init__(self, every=1):
+        """
+        Let through only every `every`-th record of each message below WARNING,
+        counting per format string so each kind of message is sampled evenly.
+        """
+        super().__init__()
+        self.every = every
+        self._seen = {}
+
+    def filter(self, record):
+        if self.every <= 1 or record.levelno >= logging.WARNING:
+            return True
+        seen = self._seen.get(record.msg, 0)
+        self._seen[record.msg] = seen + 1
+        return seen % self.every == 0
+
+
+def configure(app, name, level='INFO', sample_every=1, log_file=None, capacity=500):
+    """
+    Set up the `name` logger for one export and return it.
+
+    Handlers left over from an earlier run in the same Fusion session are
+    closed first, so re-running the script does not duplicate output.
+
+    :param level: Lowest level that is logged, by name; per-occurrence messages are DEBUG.
+    :param sample_every: Keep every n-th record of each DEBUG/INFO message.
+    :param log_file: Optional path that receives the same records as the text command log.
+    :param capacity: Records buffered before they are sent to the text command log.
+    """
+    logger = logging.getLogger(name)
+    shutdown(logger)
+    logger.setLevel(LEVELS.get(str(level).upper(), logging.INFO))
+    logger.propagate = False
+
+    handlers = [(AppLogHandler(app, capacity), '%(message)s')]
+    if log_file:
+        handlers.append((logging.FileHandler(log_file, encoding='utf-8'), '%(asctime)s %(levelname)s %(message)s'))
+    for handler, fmt in handlers:
+        handler.setFormatter(logging.Formatter(fmt))
+        logger.addHandler(handler)
+    logger.addFilter(SampleFilter(sample_every))
+    return logger
+
+
+def shutdown(logger):
+    """Flush and detach all handlers and filters of `logger`."""
+    for log_filter in list(logger.filters):
+        logger.removeFilter(log_filter)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
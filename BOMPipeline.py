@@ -0,0 +1,597 @@
+import binascii, csv, json, os, time
+from operator import itemgetter
+from html import escape
+
+
+# Compact JSON for the data island of VirtualEditableHtmlSink
+_json_encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+
+def _json(value):
+    """JSON text that is safe inside a <script> element: '<' is escaped so no '</script>' can occur."""
+    return _json_encode(value).replace('<', '\\u003c')
+
+
+def _text(value):
+    """HTML-escape text values; numbers are left to the formatting as before."""
+    if value.__class__ is str and ('<' in value or '&' in value or '>' in value):
+        return escape(value, False)
+    return value
+
+
+class RowTemplate:
+    def __init__(self, columns, editable=False, multilevel=False, prefix='', suffix='', image=False):
+        """
+        The HTML of one table row, compiled once per report into a format
+        string that renders a row with a single call.
+
+        Field values are HTML-escaped, so a '<' or '&' in a component name
+        cannot break the table.
+
+        :param columns: The (key, label) pairs of the data cells.
+        :param editable: Make the data cells editable in the browser.
+        :param multilevel: Indent the name cell by the row's level.
+        :param prefix: Markup before the data cells, e.g. '<tr>'.
+        :param suffix: Markup after the data cells (and the image cell).
+        :param image: Whether `render` takes a ready-made image cell to place after the data cells.
+        """
+        def literal(text):
+            return text.replace('{', '{{').replace('}', '}}')
+
+        attributes = literal(' contenteditable="true"' if editable else '')
+        keys = [key for key, _ in columns]
+        self.multilevel = multilevel
+        # A single key would make itemgetter return the bare value instead of a tuple
+        self._values = itemgetter(*keys) if len(keys) > 1 else lambda item: (item[keys[0]],)
+        # Field 0 is the image cell, 1.. the data cells and, for a multi-level BOM, the last one the indent
+        cells = []
+        for index, key in enumerate(keys, 1):
+            if key == 'name' and multilevel:
+                cells.append(f'<td{attributes} style="padding-left:{{{len(keys) + 1}}}px">{{{index}}}</td>')
+            else:
+                cells.append(f'<td{attributes}>{{{index}}}</td>')
+        cells = literal(prefix) + ''.join(cells)
+        self._format = (cells + ('{0}' if image else '') + literal(suffix)).format
+        self._before_image = cells.format
+        self._after_image = suffix
+
+    def render(self, item, image_cell=''):
+        return self._render(self._format, item, image_cell)
+
+    def _render(self, template, item, image_cell):
+        if self.multilevel:
+            return template(image_cell, *map(_text, self._values(item)), (item['level'] - 1) * 16)
+        return template(image_cell, *map(_text, self._values(item)))
+
+    def emit(self, write, item, image_cell):
+        """Pass the row to `write`; an EmbeddedImage cell is written as a piece of its own."""
+        if image_cell.__class__ is EmbeddedImage:
+            write(self._render(self._before_image, item, None))
+            write(image_cell)
+            write(self._after_image)
+        else:
+            write(self.render(item, image_cell))
+
+
+class EmbeddedImage:
+    """
+    Table cell embedding an image file as base64, in 'inline_streamed' image mode.
+
+    The cell stands in the sink's buffer as this small object; the image is
+    only read when the buffer is flushed, in chunks that are encoded straight
+    into the report file. No payload of the whole image is ever built.
+    """
+    __slots__ = ('path', 'quoted')
+
+    START = b'<td><img src="data:image/png;base64,'
+    END = b'" alt="Image" width="50" height="50"></td>'
+    NOT_FOUND = b'<td>Image not found</td>'
+    # The same as the start and end of a JSON string; base64 needs no escaping in between
+    JSON_MARKUP = (_json(START.decode())[:-1].encode(), _json(END.decode())[1:].encode(),
+                   _json(NOT_FOUND.decode()).encode())
+
+    def __init__(self, path, quoted=False):
+        """
+        :param quoted: Write the cell as a JSON string, for a data island.
+        """
+        self.path = path
+        self.quoted = quoted
+
+    def write_to(self, file, chunk):
+        """
+        Write the cell to the binary `file`, reading the image into the
+        bytearray `chunk`, whose size must be a multiple of 3 so every chunk
+        but the last encodes without padding.
+        """
+        start, end, not_found = self.JSON_MARKUP if self.quoted else (self.START, self.END, self.NOT_FOUND)
+        try:
+            image = open(self.path, 'rb')
+        except OSError as e:
+            print(f"Error encoding image {self.path}: {str(e)}")
+            file.write(not_found)
+            return
+        view = memoryview(chunk)
+        size = len(chunk)
+        with image:
+            file.write(start)
+            while True:
+                # Fill the whole chunk, so only the last one can end off a 3-byte boundary
+                filled = image.readinto(view)
+                while filled and filled < size:
+                    more = image.readinto(view[filled:])
+                    if not more:
+                        break
+                    filled += more
+                if not filled:
+                    break
+                file.write(binascii.b2a_base64(view[:filled], newline=False))
+                if filled < size:
+                    break
+            file.write(end)
+
+
+
+class ReportSink:
+    """
+    One report file written by an ExportPipeline.
+
+    Subclasses emit text (and EmbeddedImage cells) with `write` from `start`,
+    `add` (once per row) and `finish`; it is buffered and handed to the file
+    as one joined, UTF-8 encoded chunk every few hundred rows.
+    """
+    # Whether `add` needs the row's image cell, which costs reading and encoding the image
+    needs_images = True
+    # Profiler phase the sink's own work is recorded as
+    profile_name = 'report'
+    # Line ending '\n' is written as: None for the platform's, as in text mode, '' to leave it as is
+    newline = None
+    # Bytes of an image read at a time by EmbeddedImage cells; a multiple of 3
+    image_chunk_bytes = 3 * 64 * 1024
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._lines = []
+        self._chunk = None
+
+    def open(self, pipeline):
+        # Binary, so embedded images can be encoded straight into the file's buffer
+        self._file = open(self.path, 'wb')
+        self.start(pipeline)
+
+    def write(self, text):
+        self._lines.append(text)
+
+    def flush(self):
+        if not self._lines:
+            return
+        text = []
+        for piece in self._lines:
+            if piece.__class__ is str:
+                text.append(piece)
+            else:
+                self._write_text(text)
+                text.clear()
+                if self._chunk is None:
+                    self._chunk = bytearray(self.image_chunk_bytes)
+                piece.write_to(self._file, self._chunk)
+        self._write_text(text)
+        self._lines.clear()
+
+    def _write_text(self, text):
+        if text:
+            text = ''.join(text)
+            if self.newline is None and os.linesep != '\n':
+                text = text.replace('\n', os.linesep)
+            self._file.write(text.encode('utf-8'))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._lines.clear()
+
+    def start(self, pipeline):
+        pass
+
+    def add(self, item, image_path, image_cell):
+        raise NotImplementedError
+
+    def finish(self):
+        pass
+
+
+class CsvSink(ReportSink):
+    needs_images = False
+    newline = ''
+    profile_name = 'csv'
+
+    def start(self, pipeline):
+        self.columns = pipeline.columns
+        # The sink itself is the file object the csv writer sees, so rows land in the buffer
+        self.writer = csv.writer(self, quoting=csv.QUOTE_NONNUMERIC, delimiter=',')
+        self.writer.writerow([key for key, _ in self.columns] + ['image_path'])
+
+    def add(self, item, image_path, image_cell):
+        image_hyperlink = f'=HYPERLINK("{image_path}", "Open Image")'
+        self.writer.writerow([item[key] for key, _ in self.columns] + [image_hyperlink])
+
+
+class HtmlSink(ReportSink):
+    def __init__(self, path, editable=False):
+        """
+        :param editable: Make the data cells editable in the browser.
+        """
+        super().__init__(path)
+        self.editable = editable
+        self.profile_name = 'html_editable' if editable else 'html'
+
+    def start(self, pipeline):
+        exporter = pipeline.exporter
+        self.write(exporter.html_start(pipeline.atlas, self.path)
+                   + '<table border="1">\n'
+                   + '<tr>' + ''.join(f'<th>{escape(label)}</th>' for _, label in pipeline.columns) + '<th>Image</th></tr>\n')
+        self.template = RowTemplate(pipeline.columns, self.editable, exporter.multilevel,
+                                    prefix='<tr>', suffix='</tr>\n', image=True)
+
+    def add(self, item, image_path, image_cell):
+        self.template.emit(self.write, item, image_cell)
+
+    def finish(self):
+        self.write('</table>\n</body></html>\n')
+
+
+class EditableHtmlSink(ReportSink):
+    """HTML table with editable cells, row checkboxes and a button that downloads the checked rows as CSV."""
+    profile_name = 'html_editable'
+
+    def start(self, pipeline):
+        exporter = pipeline.exporter
+        columns = pipeline.columns
+        labels = ','.join(label for key, label in columns if key != 'volume')
+        self.write(exporter.html_start(pipeline.atlas, self.path))
+
+        # Include a script for handling selection and exporting
+        self.write(self.script(labels, exporter.include_volume))
+
+        self.write('<table id="bomTable" border="1">\n')
+
+        # The header follows the data columns, including volume only if includeVolume is True
+        self.write('<tr><th>Select</th>' + ''.join(f'<th>{escape(label)}</th>' for _, label in columns) + '<th>Image</th></tr>\n')
+
+        # Selection checkbox, editable fields (contenteditable="true") and the image column
+        self.template = RowTemplate(columns, True, exporter.multilevel,
+                                    prefix='<tr><td><input type="checkbox" class="rowCheckbox" checked="checked"></td>',
+                                    suffix='</tr>\n', image=True)
+
+    @staticmethod
+    def script(labels, include_volume):
+        return ('''
+            <script>
+            function exportSelected() {
+                var table = document.getElementById("bomTable");
+                var selectedRows = [];
+                var checkboxes = table.getElementsByClassName("rowCheckbox");
+                for (var i = 0; i < checkboxes.length; i++) {
+                    if (checkboxes[i].checked) {
+                        var row = checkboxes[i].closest("tr");
+                        var rowData = [];
+                        var cells = row.getElementsByTagName("td");
+                        for (var j = 1; j < cells.length - 1; j++) { // Skip the image cell
+                            rowData.push(cells[j].innerText);
+                        }
+                        selectedRows.push(rowData);
+                    }
+                }
+
+                if (selectedRows.length > 0) {
+                    var csvContent = "''' + labels + '''";
+                    if (''' + ('true' if include_volume else 'false') + ''') {
+                        csvContent += ",Volume";  // Include Volume if enabled
+                    }
+                    csvContent += ",Image\\n";  // Include Image column for the export
+                    
+                    selectedRows.forEach(function(row) {
+                        csvContent += row.join(",") + "\\n";  // Combine the row data
+                    });
+                    
+                    var blob = new Blob([csvContent], { type: "text/csv" });
+                    var link = document.createElement("a");
+                    link.href = URL.createObjectURL(blob);
+                    link.download = "selected_bom.csv";  // Default export file name
+                    link.click();
+                } else {
+                    alert("No rows selected for export.");
+                }
+            }
+            </script>
+            ''')
+
+    def add(self, item, image_path, image_cell):
+        self.template.emit(self.write, item, image_cell)
+
+    def finish(self):
+        # Export button to trigger CSV export
+        self.write('</table>\n'
+                   '<button onclick="exportSelected()">Export Selected Rows</button>\n'
+                   '</body></html>\n')
+
+
+class VirtualEditableHtmlSink(ReportSink):
+    """
+    Editable report for very large BOMs: the rows are embedded once as a JSON
+    data island and only the rows scrolled into view exist as table rows.
+    Edits and selections live in the page's row model, so they survive
+    scrolling and are what 'Export Selected Rows' downloads.
+
+    Rows name their image by component id; each image cell is written once to
+    a second island after the rows and only looked up for the rows rendered.
+    Embedded images are encoded from their files while that island is written,
+    so a component listed on many lines costs one payload.
+    """
+    profile_name = 'html_editable'
+    _EMBEDDED_CELL = EmbeddedImage.START.decode()
+
+    STYLE = '''<style>
+#bomViewport{height:85vh;overflow-y:auto}
+#bomTable thead th{position:sticky;top:0;background:#fff}
+#bomBody td{white-space:nowrap}
+#bomBody tr.bomSpacer td{padding:0;border:0}
+</style>
+'''
+
+    SCRIPT = '''<script>
+(function () {
+    var meta = JSON.parse(document.getElementById("bomColumns").textContent);
+    var rows = JSON.parse(document.getElementById("bomData").textContent);
+    var images = JSON.parse(document.getElementById("bomImages").textContent);
+    var selected = new Uint8Array(rows.length);
+    selected.fill(1);
+    var viewport = document.getElementById("bomViewport");
+    var body = document.getElementById("bomBody");
+    var rowHeight = 56;
+    var overscan = 20;
+    var first = -1, last = -1, pending = false;
+
+    document.getElementById("bomCount").textContent = rows.length + " rows";
+
+    function spacer(height) {
+        var tr = document.createElement("tr");
+        tr.className = "bomSpacer";
+        var td = document.createElement("td");
+        td.colSpan = meta.columns + 2;
+        td.style.height = height + "px";
+        tr.appendChild(td);
+        return tr;
+    }
+
+    function renderRow(i) {
+        var row = rows[i];
+        var tr = document.createElement("tr");
+        tr.setAttribute("data-row", i);
+        var select = document.createElement("td");
+        var checkbox = document.createElement("input");
+        checkbox.type = "checkbox";
+        checkbox.className = "rowCheckbox";
+        checkbox.checked = selected[i] === 1;
+        select.appendChild(checkbox);
+        tr.appendChild(select);
+        for (var j = 0; j < meta.columns; j++) {
+            var td = document.createElement("td");
+            td.contentEditable = "true";
+            td.setAttribute("data-col", j);
+            if (j === meta.indent) {
+                td.style.paddingLeft = ((parseInt(row[meta.level], 10) - 1) * 16 || 0) + "px";
+            }
+            td.textContent = row[j];
+            tr.appendChild(td);
+        }
+        tr.insertAdjacentHTML("beforeend", images[row[meta.columns]] || "<td></td>");
+        return tr;
+    }
+
+    // Only the rows in view, plus a margin, are in the document; spacers keep the scroll height
+    function render() {
+        pending = false;
+        var count = rows.length;
+        var top = viewport.scrollTop;
+        var start = Math.max(0, Math.min(count, Math.floor(top / rowHeight)) - overscan);
+        var end = Math.min(count, Math.ceil((top + viewport.clientHeight) / rowHeight) + overscan);
+        if (start === first && end === last) {
+            return;
+        }
+        first = start;
+        last = end;
+        var fragment = document.createDocumentFragment();
+        fragment.appendChild(spacer(start * rowHeight));
+        for (var i = start; i < end; i++) {
+            fragment.appendChild(renderRow(i));
+        }
+        fragment.appendChild(spacer((count - end) * rowHeight));
+        body.textContent = "";
+        body.appendChild(fragment);
+    }
+
+    viewport.addEventListener("scroll", function () {
+        if (!pending) {
+            pending = true;
+            window.requestAnimationFrame(render);
+        }
+    });
+
+    // Edits and selections go to the row model, so they outlive the rendered rows
+    body.addEventListener("input", function (event) {
+        var td = event.target.closest("td[data-col]");
+        if (td) {
+            rows[td.parentNode.getAttribute("data-row")][td.getAttribute("data-col")] = td.innerText;
+        }
+    });
+    body.addEventListener("change", function (event) {
+        if (event.target.className === "rowCheckbox") {
+            selected[event.target.closest("tr").getAttribute("data-row")] = event.target.checked ? 1 : 0;
+        }
+    });
+
+    window.exportSelected = function () {
+        var lines = [];
+        for (var i = 0; i < rows.length; i++) {
+            if (selected[i]) {
+                lines.push(rows[i].slice(0, meta.columns).join(","));
+            }
+        }
+        if (lines.length > 0) {
+            var csvContent = meta.header + "\\n" + lines.join("\\n") + "\\n";
+            var blob = new Blob([csvContent], { type: "text/csv" });
+            var link = document.createElement("a");
+            link.href = URL.createObjectURL(blob);
+            link.download = "selected_bom.csv";  // Default export file name
+            link.click();
+        } else {
+            alert("No rows selected for export.");
+        }
+    };
+
+    render();
+    // Size the spacers by the height the rows actually got
+    var rendered = body.querySelector("tr[data-row]");
+    if (rendered && rendered.offsetHeight && rendered.offsetHeight !== rowHeight) {
+        rowHeight = rendered.offsetHeight;
+        first = -1;
+        render();
+    }
+})();
+</script>
+'''
+
+
+    def start(self, pipeline):
+        exporter = pipeline.exporter
+        columns = pipeline.columns
+        keys = [key for key, _ in columns]
+        self._count = 0
+        self.write(exporter.html_start(pipeline.atlas, self.path))
+        self.write(self.STYLE)
+        self.write('<div id="bomToolbar"><button onclick="exportSelected()">Export Selected Rows</button> '
+                   '<span id="bomCount"></span></div>\n')
+        self.write('<div id="bomViewport"><table id="bomTable" border="1">\n')
+        self.write('<thead><tr><th>Select</th>' + ''.join(f'<th>{escape(label)}</th>' for _, label in columns)
+                   + '<th>Image</th></tr></thead>\n<tbody id="bomBody"></tbody></table></div>\n')
+
+        # Same CSV header as the table report's export
+        header = ','.join(label for key, label in columns if key != 'volume')
+        if exporter.include_volume:
+            header += ',Volume'
+        meta = {
+            'columns': len(columns),
+            'header': header + ',Image',
+            'indent': keys.index('name') if exporter.multilevel else -1,
+            'level': keys.index('level') if exporter.multilevel else -1,
+        }
+        self.write(f'<script type="application/json" id="bomColumns">{_json(meta)}</script>\n')
+        # One array per row: the data cells, then the id of its image cell in bomImages
+        self.write('<script type="application/json" id="bomData">[\n')
+        self.keys = keys
+        self._images = {}
+
+    def add(self, item, image_path, image_cell):
+        values = []
+        for key in self.keys:
+            value = item[key]
+            # Shown as the table report shows it, e.g. 'None' for a missing volume
+            values.append(value if value.__class__ in (str, int, float) else str(value))
+        image_id = item.id
+        values.append(image_id)
+        row = _json(values)
+        self.write((',\n[' if self._count else '[') + row[1:-1] + ']')
+        self._count += 1
+
+        if image_id not in self._images:
+            # Payloads are not held until finish; the file is read again when the island is written
+            if image_cell.__class__ is EmbeddedImage or image_cell.startswith(self._EMBEDDED_CELL):
+                image_cell = EmbeddedImage(image_path, quoted=True)
+            self._images[image_id] = image_cell
+
+    def finish(self):
+        self.write('\n]</script>\n')
+        self.write('<script type="application/json" id="bomImages">{')
+        separator = '\n'
+        for image_id, image_cell in self._images.items():
+            self.write(separator + _json(image_id) + ':')
+            self.write(image_cell if image_cell.__class__ is EmbeddedImage else _json(image_cell))
+            separator = ',\n'
+        self._images = None
+        self.write('\n}</script>\n')
+        self.write(self.SCRIPT)
+        self.write('</body></html>\n')
+
+
+class ExportPipeline:
+    def __init__(self, exporter, image_directory, sinks, buffer_rows=256, profiler=None):
+        """
+        Write several reports in one pass over the BOM rows: each row's image
+        path, payload and image cell are worked out once and every sink gets
+        the row in turn.
+
+        :param exporter: The BOMExporter whose columns, image mode and HTML helpers the sinks use.
+        :param image_directory: Where the thumbnails named `<component id>.png` are.
+        :param sinks: ReportSink instances, one per output file.
+        :param buffer_rows: Rows buffered per sink between writes to its file.
+        :param profiler: Optional ExportProfiler; the time spent in each sink is added to
+            the phase named by its `profile_name`, also when `run` is on a writer thread.
+        """
+        self.exporter = exporter
+        self.image_directory = image_directory
+        self.sinks = sinks
+        self.buffer_rows = buffer_rows
+        self.columns = exporter.columns()
+        self.atlas = None
+        self.profiler = profiler
+
+    def run(self, rows):
+        """Write every sink's file from `rows`, which may be a one-shot iterator."""
+        exporter = self.exporter
+        needs_images = any(sink.needs_images for sink in self.sinks)
+        if needs_images and exporter.image_mode in exporter.ATLAS_MODES:
+            # The atlas is packed from every image before the first row is written
+            rows = list(rows)
+            self.atlas = exporter.sprite_atlas(rows, self.image_directory)
+
+        # Streamed images are read by the sinks themselves, so no payloads are prepared
+        if needs_images and exporter.image_mode != 'inline_streamed':
+            entries = exporter.rows_with_images(rows, self.image_directory, self.atlas)
+        else:
+            entries = ((item, f"{self.image_directory}/{item.id}.png", None) for item in rows)
+
+        sinks = self.sinks
+        profiling = self.profiler is not None and self.profiler.enabled
+        # Seconds spent in each sink; the shared image work is not charged to any of them
+        spent = [0.0] * len(sinks)
+
+        def call(method, *args):
+            for index, sink in enumerate(sinks):
+                if profiling:
+                    start = time.perf_counter()
+                    getattr(sink, method)(*args)
+                    spent[index] += time.perf_counter() - start
+                else:
+                    getattr(sink, method)(*args)
+
+        try:
+            call('open', self)
+            count = 0
+            for item, image_path, image_base64 in entries:
+                image_cell = exporter.image_cell(image_path, self.atlas, image_base64) if needs_images else None
+                call('add', item, image_path, image_cell)
+                count += 1
+                if count % self.buffer_rows == 0:
+                    call('flush')
+            call('finish')
+            call('flush')
+        finally:
+            # Stops the image prefetch threads if a sink failed half way
+            entries.close()
+            call('close')
+            if profiling:
+                for sink, seconds in zip(sinks, spent):
+                    self.profiler.add_phase(sink.profile_name, seconds)
+        return [sink.path for sink in sinks]
@@ -0,0 +1,124 @@
+import csv, json, math, threading, time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class ExportProfiler:
+    FIELDS = ('name', 'kind', 'count', 'total_s', 'mean_s', 'p50_s', 'p90_s', 'p99_s', 'max_s', 'slowest')
+
+    def __init__(self, enabled=True, api_counter=None):
+        """
+        Wall-clock timings of the export phases and of per-row operations.
+
+        Phases are timed once per export (collection, CSV writing, ...); samples
+        are recorded per row (one image capture, one row's properties) and
+        reported with percentiles. A disabled profiler records nothing.
+
+        :param api_counter: Optional ApiCounter whose calls are attributed to
+            the same phases, also when timing is disabled.
+        """
+        self.enabled = enabled
+        self.api_counter = api_counter
+        # phase name -> [calls, seconds]
+        self.phases = OrderedDict()
+        # sample name -> [(seconds, label), ...]
+        self.samples = OrderedDict()
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        if self.api_counter is not None:
+            with self.api_counter.phase(name), self._timed(name):
+                yield
+        else:
+            with self._timed(name):
+                yield
+
+    @contextmanager
+    def _timed(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - start)
+
+    def add_phase(self, name, seconds):
+        """
+        Add one timing of phase `name` measured by the caller, possibly on
+        another thread; unlike `phase` it leaves the API counter alone.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            entry = self.phases.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def record(self, name, seconds, label=None):
+        if self.enabled:
+            self.samples.setdefault(name, []).append((seconds, label))
+
+    @contextmanager
+    def sample(self, name, label=None):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, label)
+
+    def report(self):
+        """Return one dict per phase and per sample name, in the order they were first seen."""
+        rows = []
+        for name, (calls, seconds) in self.phases.items():
+            rows.append({'name': name, 'kind': 'phase', 'count': calls, 'total_s': seconds,
+                         'mean_s': seconds / calls, 'p50_s': None, 'p90_s': None, 'p99_s': None,
+                         'max_s': None, 'slowest': None})
+        for name, samples in self.samples.items():
+            values = sorted(seconds for seconds, _ in samples)
+            total = sum(values)
+            slowest = max(samples, key=lambda sample: sample[0])
+            rows.append({'name': name, 'kind': 'sample', 'count': len(values), 'total_s': total,
+                         'mean_s': total / len(values), 'p50_s': percentile(values, 0.5),
+                         'p90_s': percentile(values, 0.9), 'p99_s': percentile(values, 0.99),
+                         'max_s': values[-1], 'slowest': slowest[1]})
+        return rows
+
+    def write(self, base_path):
+        """Write `<base_path>_profile.json` and `<base_path>_profile.csv` and return their paths."""
+        rows = self.report()
+        json_path = base_path + '_profile.json'
+        csv_path = base_path + '_profile.csv'
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump({'elapsed_s': time.perf_counter() - self._started, 'entries': rows}, f, indent=2)
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=self.FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        return json_path, csv_path
+
+    def summary(self):
+        """A few lines for the text command log."""
+        lines = [f"Export profile: {time.perf_counter() - self._started:.2f} s"]
+        for row in self.report():
+            if row['kind'] == 'phase':
+                lines.append(f"  {row['name']}: {row['total_s']:.3f} s")
+            else:
+                lines.append(f"  {row['name']}: {row['count']} x, total {row['total_s']:.3f} s, "
+                             f"p50 {row['p50_s'] * 1000:.1f} ms, p90 {row['p90_s'] * 1000:.1f} ms, "
+                             f"max {row['max_s'] * 1000:.1f} ms ({row['slowest']})")
+        return '\n'.join(lines)
@@ -0,0 +1,187 @@
+"""
+Save a collected BOM to a snapshot file and rebuild the CSV/HTML reports from
+it without Fusion 360.
+
+    python -m ExportBOM.BOMSnapshot Root_snapshot.json.gz --output build/Root
+    python -m ExportBOM.BOMSnapshot Root_snapshot.json --images Root_files --image-mode atlas
+
+Run it from the folder that contains the ExportBOM script folder. Snapshots
+whose name ends in ``.gz`` are gzip-compressed.
+"""
+import argparse, gzip, json, os, sys
+
+from .BOMExporterClass import BOMExporter, BomLine, BomRow
+
+FORMAT = 'ExportBOM snapshot'
+VERSION = 1
+
+
+def _open(path, mode, compressed=None):
+    if compressed is None:
+        compressed = path.endswith('.gz')
+    if compressed:
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def occurrence_records(occurrences):
+    """
+    Return [component id, path, transform] for each of `occurrences`, e.g.
+    `rootComponent.allOccurrences`. The path is the occurrence's full path
+    name and the transform its 16 matrix values, row by row, relative to the
+    parent component. Occurrences without a component are left out.
+    """
+    records = []
+    for occ in occurrences:
+        comp = occ.component
+        if comp is not None:
+            records.append([comp.id, occ.fullPathName, list(occ.transform.asArray())])
+    return records
+
+
+def write_snapshot(path, rows, report_rows, image_directory, include_volume=False, multilevel=False,
+                   image_mode='inline', design=None, occurrences=None):
+    """
+    Write the BOM snapshot rows and, for a multi-level BOM, its report lines.
+
+    Only values already held by the rows are written, so this makes no calls
+    into Fusion.
+
+    :param rows: Unique component rows, as returned by `BomAggregator.rows`.
+    :param report_rows: The rows the reports list; BomLine rows for a multi-level BOM.
+    :param image_directory: Where the thumbnails named `<component id>.png` are.
+    :param design: Name of the exported design, for reference.
+    :param occurrences: Records from `occurrence_records`, or None to leave them out.
+    """
+    columns = ['id', 'name', 'instances', 'mat'] + (['volume'] if include_volume else [])
+    snapshot = {
+        'format': FORMAT,
+        'version': VERSION,
+        'design': design,
+        'include_volume': include_volume,
+        'multilevel': multilevel,
+        'image_mode': image_mode,
+        'image_directory': image_directory,
+        'columns': columns,
+        'components': [[row[key] for key in columns] for row in rows],
+        'lines': [[line.level, line.id, line.quantity, line.instances] for line in report_rows] if multilevel else None,
+        'occurrences': occurrences,
+    }
+    with _open(path + '.tmp', 'w', path.endswith('.gz')) as f:
+        json.dump(snapshot, f, separators=(',', ':'))
+    os.replace(path + '.tmp', path)
+
+
+class Snapshot:
+    def __init__(self, path):
+        """
+        A snapshot file loaded back into BomRow (and BomLine) objects.
+
+        Rows have no way to look their component up again; everything the
+        writers read is in the snapshot.
+
+        Raises ValueError for files that are not ExportBOM snapshots.
+        """
+        with _open(path, 'r') as f:
+            data = json.load(f)
+        if data.get('format') != FORMAT or data.get('version') != VERSION:
+            raise ValueError(f"Not an ExportBOM snapshot: {path}")
+
+        self.design = data['design']
+        self.include_volume = data['include_volume']
+        self.multilevel = data['multilevel']
+        self.image_mode = data['image_mode']
+        self.image_directory = data['image_directory']
+        # [component id, path, transform] per occurrence; None in older snapshots
+        self.occurrences = data.get('occurrences')
+
+        columns = data['columns']
+        self.rows = []
+        rows_by_id = {}
+        for values in data['components']:
+            fields = dict(zip(columns, values))
+            row = BomRow(fields['id'], fields['name'], fields['instances'], None)
+            row['mat'] = fields['mat']
+            row['volume'] = fields.get('volume')
+            self.rows.append(row)
+            rows_by_id[row.id] = row
+
+        if data['lines'] is None:
+            self.report_rows = self.rows
+        else:
+            self.report_rows = [BomLine(rows_by_id[comp_id], level, quantity, instances)
+                                for level, comp_id, quantity, instances in data['lines']]
+
+
+def report_base(snapshot_path):
+    """The base path of the reports belonging to a snapshot: its path without `_snapshot.json[.gz]`."""
+    base_path = snapshot_path
+    for suffix in ('.gz', '.json', '_snapshot'):
+        if base_path.endswith(suffix):
+            base_path = base_path[:-len(suffix)]
+    return base_path
+
+
+def locate_images(snapshot, snapshot_path):
+    """
+    Return the snapshot's thumbnail directory, or, when it does not exist on
+    this machine, the directory of the same name next to the snapshot file.
+    """
+    if os.path.isdir(snapshot.image_directory):
+        return snapshot.image_directory
+    beside = os.path.join(os.path.dirname(os.path.abspath(snapshot_path)),
+                          os.path.basename(os.path.normpath(snapshot.image_directory)))
+    return beside if os.path.isdir(beside) else snapshot.image_directory
+
+
+def export_reports(snapshot, base_path, image_directory=None, image_mode=None, image_workers=4,
+                   editable_report='table'):
+    """
+    Write `<base_path>_bom.csv`, `<base_path>_html.html` and
+    `<base_path>_html_editable.html` from a loaded Snapshot.
+
+    :param image_directory: Thumbnail directory to use instead of the one recorded in the snapshot.
+    :param image_mode: Image mode to use instead of the recorded one.
+    :param editable_report: Layout of the editable report, 'table' or 'virtual'.
+    """
+    image_directory = image_directory or snapshot.image_directory
+    exporter = BOMExporter(snapshot.include_volume, image_mode=image_mode or snapshot.image_mode,
+                           image_workers=image_workers, multilevel=snapshot.multilevel,
+                           editable_report=editable_report)
+    try:
+        return exporter.report_pipeline(image_directory, base_path).run(snapshot.report_rows)
+    finally:
+        exporter.image_payloads.clear()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m ExportBOM.BOMSnapshot', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('snapshot', help='Snapshot written by the script (snapshotExport).')
+    parser.add_argument('--output', help='Base path of the reports; defaults to the snapshot path without its suffix.')
+    parser.add_argument('--images', help='Thumbnail directory, if it moved since the snapshot was taken.')
+    parser.add_argument('--image-mode', choices=BOMExporter.IMAGE_MODES)
+    parser.add_argument('--image-workers', type=int, default=4)
+    parser.add_argument('--editable-report', choices=BOMExporter.EDITABLE_REPORTS, default='table')
+    args = parser.parse_args(argv)
+
+    try:
+        snapshot = Snapshot(args.snapshot)
+    except (OSError, ValueError) as e:
+        print(f"Error reading snapshot {args.snapshot}: {str(e)}", file=sys.stderr)
+        return 1
+
+    base_path = args.output or report_base(args.snapshot)
+    directory = os.path.dirname(base_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    image_directory = args.images or locate_images(snapshot, args.snapshot)
+    for path in export_reports(snapshot, base_path, image_directory, args.image_mode, args.image_workers,
+                               args.editable_report):
+        print(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+import os, struct, zlib
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# samples per pixel for each PNG color type
+CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+class PngTile:
+    def __init__(self, path):
+        """
+        The parts of a PNG file needed to stack it into an atlas strip.
+
+        Raises ValueError for files that are not PNGs.
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        if not data.startswith(PNG_SIGNATURE):
+            raise ValueError(f"Not a PNG file: {path}")
+
+        idat = []
+        self.palette = b''
+        self.transparency = b''
+        offset = len(PNG_SIGNATURE)
+        while offset < len(data):
+            length, tag = struct.unpack('>I4s', data[offset:offset + 8])
+            body = data[offset + 8:offset + 8 + length]
+            if tag == b'IHDR':
+                (self.width, self.height, self.bit_depth, self.color_type,
+                 _, _, self.interlace) = struct.unpack('>IIBBBBB', body)
+            elif tag == b'PLTE':
+                self.palette = body
+            elif tag == b'tRNS':
+                self.transparency = body
+            elif tag == b'IDAT':
+                idat.append(body)
+            elif tag == b'IEND':
+                break
+            offset += 12 + length
+
+        self.path = path
+        self._compressed = b''.join(idat)
+
+    @property
+    def format(self):
+        """Tiles with equal formats can share one strip."""
+        return (self.width, self.bit_depth, self.color_type, self.interlace, self.palette, self.transparency)
+
+    def scanlines(self):
+        """
+        Return the filtered scanlines with the first one rewritten unfiltered.
+
+        Every PNG filter except the one on the first row only looks at the
+        same image, so once the first row no longer depends on the (implicit,
+        all-zero) row above it the tile can follow any other tile in a strip.
+        """
+        raw = zlib.decompress(self._compressed)
+        channels = CHANNELS[self.color_type]
+        stride = (self.width * channels * self.bit_depth + 7) // 8
+        bpp = max(1, channels * self.bit_depth // 8)
+
+        filter_type = raw[0]
+        row = bytearray(raw[1:1 + stride])
+        if filter_type in (1, 4):
+            # With an all-zero row above, Paeth always picks the left byte, like Sub.
+            for i in range(bpp, stride):
+                row[i] = (row[i] + row[i - bpp]) & 0xff
+        elif filter_type == 3:
+            for i in range(bpp, stride):
+                row[i] = (row[i] + (row[i - bpp] >> 1)) & 0xff
+        return b'\x00' + bytes(row) + raw[1 + stride:]
+
+
+def _chunk(tag, body):
+    return struct.pack('>I', len(body)) + tag + body + struct.pack('>I', zlib.crc32(tag + body) & 0xffffffff)
+
+
+class SpriteAtlas:
+    def __init__(self, tiles_per_atlas=64):
+        """
+        Stack thumbnails into a few vertical strip PNGs so the HTML reports
+        reference one image per strip with CSS offsets.
+
+        Strips are a single tile wide, which lets the tiles' compressed rows be
+        reused without decoding their pixels.
+
+        :param tiles_per_atlas: Tiles per strip; 64 thumbnails of 128px make an 8192px tall image.
+        """
+        self.tiles_per_atlas = tiles_per_atlas
+        self.atlases = []
+        # normalized image path -> (atlas index, y offset, width, height)
+        self.positions = {}
+
+    def build(self, image_paths, directory, prefix='atlas'):
+        """
+        Write strips for `image_paths` into `directory` and return their paths.
+
+        Images that are missing, interlaced or not PNGs are skipped; look them
+        up with `position` and fall back to another way of showing them.
+        """
+        groups = {}
+        for image_path in image_paths:
+            key = os.path.normpath(image_path)
+            if key in self.positions or not os.path.exists(image_path):
+                continue
+            try:
+                tile = PngTile(image_path)
+            except (OSError, ValueError, struct.error) as e:
+                print(f"Error reading image {image_path}: {str(e)}")
+                continue
+            if tile.interlace or tile.color_type not in CHANNELS:
+                continue
+            groups.setdefault(tile.format, []).append(tile)
+
+        for tiles in groups.values():
+            for start in range(0, len(tiles), self.tiles_per_atlas):
+                self._write_strip(tiles[start:start + self.tiles_per_atlas], directory, prefix)
+        return [path for path, _, _ in self.atlases]
+
+    def _write_strip(self, tiles, directory, prefix):
+        index = len(self.atlases)
+        path = os.path.join(directory, f"{prefix}_{index}.png")
+        first = tiles[0]
+
+        compressor = zlib.compressobj()
+        idat = []
+        height = 0
+        for tile in tiles:
+            try:
+                scanlines = tile.scanlines()
+            except zlib.error as e:
+                print(f"Error reading image {tile.path}: {str(e)}")
+                continue
+            idat.append(compressor.compress(scanlines))
+            self.positions[os.path.normpath(tile.path)] = (index, height, tile.width, tile.height)
+            height += tile.height
+        idat.append(compressor.flush())
+
+        header = struct.pack('>IIBBBBB', first.width, height, first.bit_depth, first.color_type, 0, 0, 0)
+        with open(path, 'wb') as f:
+            f.write(PNG_SIGNATURE)
+            f.write(_chunk(b'IHDR', header))
+            if first.palette:
+                f.write(_chunk(b'PLTE', first.palette))
+            if first.transparency:
+                f.write(_chunk(b'tRNS', first.transparency))
+            f.write(_chunk(b'IDAT', b''.join(idat)))
+            f.write(_chunk(b'IEND', b''))
+        self.atlases.append((path, first.width, height))
+
+    def position(self, image_path):
+        """Return (atlas index, y offset, width, height) or None if not packed."""
+        return self.positions.get(os.path.normpath(image_path))
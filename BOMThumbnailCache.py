@@ -0,0 +1,189 @@
+import hashlib, json, os, shutil, time
+
+
+def design_version(component):
+    try:
+        data_file = component.parentDesign.parentDocument.dataFile
+    except AttributeError:
+        return None
+    return data_file.versionNumber if data_file else None
+
+
+def _appearance_name(entity):
+    appearance = entity.appearance
+    return appearance.name if appearance else ''
+
+
+def placement_fingerprint(occurrence):
+    """
+    Summarize how the occurrence a thumbnail is taken through shows its
+    component: its transform, since the camera eye is fixed in world space,
+    and its appearance override.
+    """
+    transform = ','.join(f'{v:.6g}' for v in occurrence.transform.asArray())
+    return f'{transform}|{_appearance_name(occurrence)}'
+
+
+def geometry_fingerprint(component, memo, include_version=True):
+    """
+    Summarize the geometry a thumbnail of `component` shows: body count,
+    solid volume, bounding box, body appearances, material, optionally the version of the design
+    that owns it and, for sub-assemblies, the fingerprint and placement of
+    each child occurrence, so moving a part inside it changes the result.
+
+    Results are memoized in `memo` by component id, so use one dict per
+    `include_version` setting.
+    """
+    cached = memo.get(component.id)
+    if cached is not None:
+        return cached
+
+    bodies = 0
+    volume = 0.0
+    low = high = None
+    appearances = set()
+    for body in component.bRepBodies:
+        bodies += 1
+        appearances.add(_appearance_name(body))
+        if body.isSolid:
+            volume += body.volume
+        box = body.boundingBox
+        box_low = (box.minPoint.x, box.minPoint.y, box.minPoint.z)
+        box_high = (box.maxPoint.x, box.maxPoint.y, box.maxPoint.z)
+        low = box_low if low is None else tuple(map(min, low, box_low))
+        high = box_high if high is None else tuple(map(max, high, box_high))
+
+    children = []
+    for occ in component.occurrences:
+        child = occ.component
+        if child is not None:
+            child_print = geometry_fingerprint(child, memo, include_version)
+            placement = ','.join(f'{v:.6g}' for v in occ.transform.asArray())
+            children.append(f'{child_print}@{placement}')
+
+    material = component.material
+    parts = [
+        str(bodies),
+        f'{volume:.6g}',
+        repr(tuple(f'{v:.6g}' for v in low)) if low else '',
+        repr(tuple(f'{v:.6g}' for v in high)) if high else '',
+        material.name if material else '',
+        ','.join(sorted(appearances)),
+        str(design_version(component)) if include_version else '',
+    ]
+    # Sorted, so only where the children are matters, not the order they are listed in
+    parts.extend(sorted(children))
+    cached = hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+    memo[component.id] = cached
+    return cached
+
+
+class ThumbnailCache:
+    INDEX_NAME = 'index.json'
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        """
+        Persistent store of rendered component thumbnails.
+
+        Entries are keyed by component id plus a fingerprint of what the image
+        depends on, and the least recently used ones are evicted once the
+        cache grows past `max_bytes`.
+
+        :param directory: Where thumbnails are kept; must not be an export's `_files` directory.
+        :param max_bytes: Size bound for all cached images together.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._fingerprints = {}
+        self._dirty = False
+        os.makedirs(directory, exist_ok=True)
+        self._index = self._load_index()
+        self._total_bytes = sum(size for size, _ in self._index.values())
+
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.directory, self.INDEX_NAME), encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Drop entries whose image was removed behind our back.
+        return {key: entry for key, entry in index.items() if os.path.isfile(self._path(key))}
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.png')
+
+    def fingerprint(self, component):
+        return geometry_fingerprint(component, self._fingerprints)
+
+    def key(self, component, occurrence=None, width=128, height=128):
+        """
+        :param occurrence: The occurrence the thumbnail is taken through; its
+            placement and appearance override are part of the key.
+        """
+        placement = placement_fingerprint(occurrence) if occurrence is not None else ''
+        raw = f'{component.id}|{self.fingerprint(component)}|{placement}|{width}x{height}'
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def fetch(self, key, image_path):
+        """
+        Place the cached image for `key` at `image_path`, hard-linking when the
+        file system allows it. Returns False on a cache miss.
+        """
+        entry = self._index.get(key)
+        source = self._path(key)
+        if entry is None or not os.path.isfile(source):
+            self.misses += 1
+            return False
+
+        os.makedirs(os.path.dirname(image_path), exist_ok=True)
+        if os.path.exists(image_path):
+            os.remove(image_path)
+        try:
+            os.link(source, image_path)
+        except OSError:
+            shutil.copyfile(source, image_path)
+
+        entry[1] = time.time()
+        self._dirty = True
+        self.hits += 1
+        return True
+
+    def store(self, key, image_path):
+        """Copy a freshly rendered image into the cache and evict if over budget."""
+        target = self._path(key)
+        try:
+            shutil.copyfile(image_path, target)
+        except OSError as e:
+            print(f"Error caching thumbnail {image_path}: {str(e)}")
+            return
+        previous = self._index.get(key)
+        if previous is not None:
+            self._total_bytes -= previous[0]
+        self._index[key] = [os.path.getsize(target), time.time()]
+        self._total_bytes += self._index[key][0]
+        self._dirty = True
+        self._evict()
+
+    def _evict(self):
+        if self._total_bytes <= self.max_bytes:
+            return
+        for key, (size, _) in sorted(self._index.items(), key=lambda item: item[1][1]):
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            del self._index[key]
+            self._total_bytes -= size
+            if self._total_bytes <= self.max_bytes:
+                break
+
+    def save(self):
+        if not self._dirty:
+            return
+        index_path = os.path.join(self.directory, self.INDEX_NAME)
+        with open(index_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(index_path + '.tmp', index_path)
+        self._dirty = False
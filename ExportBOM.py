@@ -1,13 +1,68 @@
-import adsk.core, adsk.fusion, traceback, time, csv, os, base64,shutil
-from .BOMExporterClass import BOMExporter
+import adsk.core, adsk.fusion, traceback, time, csv, os, base64,shutil, logging
+from .BOMExporterClass import BOMExporter, BomAggregator, BomRow, RenderSession, ReportStream, VisibilityManager
+from .BOMThumbnailCache import ThumbnailCache
+from .BOMIncremental import ExportManifest
+from .BOMProfiler import ExportProfiler
+from .BOMApiCounter import ApiCounter
+from .BOMSnapshot import occurrence_records, write_snapshot
+from . import BOMLogging
 # Global variable to control whether volume is included
 includeVolume = False  # Set this to False if you do not want to include volume in the BOM
+# 'occurrences' walks the flattened root.allOccurrences, 'definitions' walks each
+# unique component once and multiplies instance counts down the tree
+traversalMode = 'occurrences'
+# 'flat' lists each component once; 'multilevel' emits an indented BOM with
+# levels, per-parent quantities and rolled-up instances (always walks definitions)
+bomStructure = 'flat'
+# Rendered thumbnails are kept in this directory between runs and reused while
+# the component and its placement are unchanged, e.g.
+# os.path.join(os.path.expanduser('~'), '.ExportBOM', 'thumbnails'); fingerprinting
+# reads every body's volume and bounding box. None always renders every image
+thumbnailCacheDirectory = None
+thumbnailCacheMaxBytes = 256 * 1024 * 1024
+# Keep the previous export and only re-render images and rewrite reports whose
+# content changed, instead of deleting everything and starting over
+incrementalExport = False
+# How the HTML reports show thumbnails: 'inline' embeds one image per row,
+# 'inline_streamed' embeds the same but encodes each image from disk straight
+# into the report file (memory stays flat on large BOMs), 'atlas' packs them
+# into sprite strips next to the images, 'atlas_embedded' embeds each strip once
+imageMode = 'inline'
+# Layout of the editable HTML report: 'table' writes one editable table row per
+# BOM row, 'virtual' embeds the rows as JSON and only builds the rows scrolled
+# into view, so BOMs with tens of thousands of rows still open instantly
+editableReport = 'table'
+# Threads reading and encoding thumbnails ahead of the HTML writers (1 disables)
+imageWorkers = 4
+# Write the reports on worker threads while the images are taken, each row as
+# soon as its image exists (not with the atlas image modes or incrementalExport)
+streamReports = True
+# Time each export phase and write <name>_profile.json / <name>_profile.csv next
+# to the reports; the summary is also printed to the text command log if enabled
+profileExport = False
+profileLogSummary = True
+# Count every property read and method call on the Fusion objects, per phase,
+# and write them to <name>_api_calls.json (slows the export down noticeably)
+countApiCalls = False
+# Save the collected BOM to <name>_snapshot.json.gz so the reports can be rebuilt
+# without Fusion: python -m ExportBOM.BOMSnapshot <name>_snapshot.json.gz
+snapshotExport = False
+# Messages below this level are dropped: 'DEBUG' traces every occurrence, 'INFO'
+# only reports summaries. Kept messages reach the text command log in batches
+logLevel = 'INFO'
+# Keep only every n-th per-occurrence message (1 keeps all)
+logSampleEvery = 1
+# Also write the log to this file; None disables
+logFile = None
 
 def run(context):
     ui = None
+    exporter = None
+    log = logging.getLogger(__name__)
     try:
         app = adsk.core.Application.get()
         ui  = app.userInterface
+        log = BOMLogging.configure(app, __name__, logLevel, logSampleEvery, logFile)
 
         product = app.activeProduct
         design = adsk.fusion.Design.cast(product)
@@ -16,15 +71,22 @@ def run(context):
             ui.messageBox('The DESIGN workspace must be active when running this script.', title)
             return
 
-        # Get all occurrences in the root component of the active design
+        apiCounter = None
+        if countApiCalls:
+            # Wrap after the cast above; cast does not accept wrapped objects
+            apiCounter = ApiCounter()
+            app = apiCounter.wrap(app)
+            design = apiCounter.wrap(design)
+            product = design
+        profiler = ExportProfiler(profileExport, apiCounter)
+
         root = design.rootComponent
-        occs = root.allOccurrences
 
-        visibleTopLevelComp = []
-        for occ in root.occurrences:
-            if occ.isLightBulbOn:
-                visibleTopLevelComp.append(occ)
-        exporter = BOMExporter(includeVolume)
+        thumbnailCache = None
+        if thumbnailCacheDirectory:
+            thumbnailCache = ThumbnailCache(thumbnailCacheDirectory, thumbnailCacheMaxBytes)
+        exporter = BOMExporter(includeVolume, thumbnailCache, image_mode=imageMode, image_workers=imageWorkers,
+                               multilevel=bomStructure == 'multilevel', editable_report=editableReport)
         fileDialog = ui.createFileDialog()
         fileDialog.isMultiSelectEnabled = False
         fileDialog.title = "Save BOM As"
@@ -36,92 +98,184 @@ def run(context):
             filename = fileDialog.filename
             
             
-            exporter.delete_related_files(filename)
+            if not incrementalExport:
+                exporter.delete_related_files(filename)
             path, file = os.path.split(filename)
             dst_directory = os.path.splitext(filename)[0] + '_files'
+            manifest = ExportManifest(dst_directory, includeVolume, imageMode, editableReport) if incrementalExport else None
 
-        # Gather information about each unique component
-        bom = []
-        for occ in occs:
-            comp = occ.component
+        bom, reportRows, walkDefinitions = collect_bom(exporter, design, profiler, log)
 
-            if comp is None:
-                app.log("Skipping occurrence with no component")
-                continue  # Skip this occurrence
+        base = os.path.splitext(filename)[0]
+        # Sprite atlases need every image before the first row, and an incremental
+        # export only knows whether to rewrite the reports once all images are checked
+        pipeline = exporter.report_pipeline(dst_directory, base, profiler)
+        stream = None
+        if streamReports and not manifest and imageMode not in BOMExporter.ATLAS_MODES:
+            stream = ReportStream([pipeline.run], reportRows)
+            stream.start()
 
-            app.log("Component: " + str(comp.name))
+        try:
+            capture_images(app, ui, exporter, bom, root, dst_directory, profiler, manifest, stream,
+                           find_occurrences=walkDefinitions)
 
-            # Check if the component name is defined
-            if not comp.name:
-                app.log("Skipping component with undefined name")
-                continue  # Skip this component and move to the next occurrence
+            if thumbnailCache:
+                thumbnailCache.save()
 
+            if snapshotExport:
+                with profiler.phase('snapshot'):
+                    write_snapshot(base + '_snapshot.json.gz', bom, reportRows, dst_directory,
+                                   includeVolume, bomStructure == 'multilevel', imageMode, root.name,
+                                   occurrence_records(root.allOccurrences))
 
-            app.log("SubComponent: " + str(comp.occurrences.count))
-            
-            jj = 0
-            for bomI in bom:
-                if bomI['component'] == comp:
-                    bomI['instances'] += 1
-                    break
-                jj += 1
-
-            if jj == len(bom):
-                volume = 0
-                bodies = comp.bRepBodies
-                for bodyK in bodies:
-                    if bodyK.isSolid:
-                        volume += bodyK.volume
-
-                app.log("Component_loop1: " + str(comp.name))
-                app.log("SubComponent_mat: " + str(comp.material))
-                # app.log("SubComponent_mat: " + str(comp.material.name))
-
-                if comp.material:
-                    if comp.material.name:
-                        bom.append({
-                            'component': comp,
-                            'name': comp.name,
-                            'instances': 1,
-                            'mat':  comp.material.name ,
-                            'volume': volume if includeVolume else None
-                        })
-                    else:
-                        bom.append({
-                            'component': comp,
-                            'name': comp.name,
-                            'instances': 1,
-                            'mat':  "Not Assigned" ,
-                            'volume': volume if includeVolume else None
-                        })
-                else:
-                    bom.append({
-                        'component': comp,
-                        'name': comp.name,
-                        'instances': 1,
-                        'mat':  "Not Assigned" ,
-                        'volume': volume if includeVolume else None
-                    })
-
-
-
-        for bomItem in bom:
-            exporter.take_image(app, ui, bomItem['component'], occs, dst_directory)
-            exporter.Unisolate(visibleTopLevelComp)
-
-       
-
-        # msg = exporter.space_pad_right('Name', 25) + \
-        #           exporter.space_pad_right('Instances', 15) + \
-        #           exporter.space_pad_right('Material', 15) + \
-        #           ('Volume\n' if includeVolume else '\n') + \
-        #           exporter.walk_through(bom)
-        
-        exporter.build_csv(bom, dst_directory, os.path.splitext(filename)[0] + '_bom')
-        exporter.build_html_with_images(app, bom, dst_directory, os.path.splitext(filename)[0] + '_html', editable=False)
-        exporter.buildHTMLWithImagesEditableCSV(app, bom, dst_directory, os.path.splitext(filename)[0] + '_html', editable=True)
+            # msg = exporter.space_pad_right('Name', 25) + \
+            #           exporter.space_pad_right('Instances', 15) + \
+            #           exporter.space_pad_right('Material', 15) + \
+            #           ('Volume\n' if includeVolume else '\n') + \
+            #           exporter.walk_through(bom)
+
+            write_reports(pipeline, stream, manifest, reportRows, profiler)
+        except BaseException:
+            # Whatever failed after the writers started, release them (and the image
+            # prefetch threads) and close the report files before the error is reported
+            if stream:
+                stream.abort()
+            raise
+
+        if manifest:
+            manifest.remove_stale_images()
+            manifest.save()
+            log.info(manifest.summary())
+
+        if profiler.enabled:
+            profiler.write(base)
+            if profileLogSummary:
+                log.info(profiler.summary())
+        if apiCounter:
+            apiCounter.write(base)
+            log.info(apiCounter.summary())
         # ui.messageBox(msg, 'Bill Of Materials')
 
     except Exception as e:
+        log.error('Export failed:\n%s', traceback.format_exc())
         if ui:
             ui.messageBox(f'Failed:\n{str(e)}')
+    finally:
+        # Also on failure: drop the payloads held in memory and the spill directory in the temp folder
+        if exporter:
+            exporter.image_payloads.clear()
+        BOMLogging.shutdown(log)
+
+
+def collect_bom(exporter, design, profiler, log):
+    """
+    Gather information about each unique component of `design`.
+
+    Returns (bom, report rows, walked definitions): the unique component rows,
+    the rows the reports list (BomLine rows for a multi-level BOM) and whether
+    the component definitions were walked instead of the occurrences, in which
+    case the renderer has to look the occurrences up itself.
+    """
+    root = design.rootComponent
+    aggregator = BomAggregator(includeVolume, design.allComponents.itemById, profiler)
+    walkDefinitions = traversalMode == 'definitions' or bomStructure == 'multilevel'
+    with profiler.phase('collection'):
+        if walkDefinitions:
+            aggregator.add_tree(root)
+        else:
+            # The trace messages read extra properties, so only build them when they are kept
+            trace = log.isEnabledFor(logging.DEBUG)
+            for occ in root.allOccurrences:
+                comp = occ.component
+
+                if comp is None:
+                    log.debug("Skipping occurrence with no component")
+                    continue  # Skip this occurrence
+
+                # A component seen before already has its snapshot; only count it
+                compId = comp.id
+                bomItem = aggregator.count(compId)
+                if bomItem is not None:
+                    if trace:
+                        log.debug("Component: %s", bomItem.name)
+                    continue
+
+                name = comp.name
+                if trace:
+                    log.debug("Component: %s", name)
+
+                # Check if the component name is defined
+                if not name:
+                    log.debug("Skipping component with undefined name")
+                    continue  # Skip this component and move to the next occurrence
+
+
+                if trace:
+                    log.debug("SubComponent: %s", comp.occurrences.count)
+
+                bomItem = aggregator.add_row(BomRow(compId, name, 1, aggregator.resolver(comp)), comp)
+                exporter.index_occurrence(occ, bomItem)
+                if trace:
+                    log.debug("Component_loop1: %s", name)
+                    log.debug("SubComponent_mat: %s", bomItem['mat'])
+
+        bom = aggregator.rows()
+        reportRows = aggregator.indented_rows(root) if bomStructure == 'multilevel' else bom
+    return bom, reportRows, walkDefinitions
+
+
+def capture_images(app, ui, exporter, bom, root, dst_directory, profiler, manifest=None, stream=None,
+                   find_occurrences=False):
+    """
+    Save the thumbnail of every row of `bom` to `<dst_directory>/<component id>.png`.
+
+    Visibility is recorded once, shots inside the same referenced context are
+    taken back to back and everything is restored once at the end; the render
+    session does the same for the grid and camera.
+
+    :param root: Root component of the design.
+    :param manifest: ExportManifest of an incremental export; images it finds
+        current are not taken again.
+    :param stream: ReportStream told about each image once it is on disk.
+    :param find_occurrences: The rows were collected from the component
+        definitions, so their occurrences still have to be looked up under `root`.
+    """
+    visibility = VisibilityManager(root.occurrences)
+    try:
+        with profiler.phase('images'), RenderSession(app, ui) as session:
+            for bomItem, component in exporter.capture_order(bom, root if find_occurrences else None):
+                image_path = os.path.join(dst_directory, f"{bomItem.id}.png")
+                if manifest:
+                    shot = exporter.representative(bomItem.id)
+                    manifest.add_row(bomItem, component, shot.occurrence if shot else None)
+                    if manifest.image_is_current(bomItem.id, image_path):
+                        continue
+                start = time.perf_counter()
+                rendered = exporter.take_image(app, ui, component, None, dst_directory, visibility, session)
+                profiler.record('image_render' if rendered else 'image_cached', time.perf_counter() - start, bomItem.name)
+                if manifest:
+                    manifest.record_image(bomItem.id, image_path)
+                if stream:
+                    stream.ready(bomItem.id)
+    finally:
+        visibility.restore()
+
+
+def write_reports(pipeline, stream, manifest, report_rows, profiler):
+    """
+    Finish the reports of `pipeline`: wait for `stream` when the rows were
+    already being written, otherwise write `report_rows` in one go, skipping
+    it when `manifest` finds the reports of an incremental export current.
+    """
+    if stream:
+        # Most rows are already written; wait for the writers to catch up
+        with profiler.phase('reports'):
+            stream.finish()
+        return
+
+    outputs = [sink.path for sink in pipeline.sinks]
+    if not manifest or not manifest.outputs_are_current(report_rows, outputs):
+        with profiler.phase('reports'):
+            pipeline.run(report_rows)
+        if manifest:
+            manifest.record_outputs(outputs)
@@ -0,0 +1,9 @@
+"""
+Offline stand-in for the subset of the Fusion 360 ``adsk`` package that
+ExportBOM touches.  Put ``benchmarks/fake_adsk`` on ``sys.path`` to use it.
+"""
+from . import core, fusion
+
+
+def doEvents():
+    pass
@@ -0,0 +1,217 @@
+import collections, functools, os, struct, time, zlib
+
+
+class ObjectCollection:
+    def __init__(self, items=None):
+        self._items = list(items) if items is not None else []
+
+    @property
+    def count(self):
+        return len(self._items)
+
+    def item(self, index):
+        return self._items[index]
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __iter__(self):
+        return iter(self._items)
+
+
+class Point3D:
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    @staticmethod
+    def create(x=0.0, y=0.0, z=0.0):
+        return Point3D(x, y, z)
+
+    def copy(self):
+        return Point3D(self.x, self.y, self.z)
+
+
+class Vector3D(Point3D):
+    @staticmethod
+    def create(x=0.0, y=0.0, z=0.0):
+        return Vector3D(x, y, z)
+
+    def copy(self):
+        return Vector3D(self.x, self.y, self.z)
+
+
+class Matrix3D:
+    def __init__(self, translation=None):
+        self.translation = translation if translation is not None else Vector3D()
+
+    @staticmethod
+    def create():
+        return Matrix3D()
+
+    def asArray(self):
+        t = self.translation
+        return (1.0, 0.0, 0.0, t.x, 0.0, 1.0, 0.0, t.y, 0.0, 0.0, 1.0, t.z, 0.0, 0.0, 0.0, 1.0)
+
+
+class DialogResults:
+    DialogOK = 0
+    DialogCancel = 1
+    DialogError = 2
+
+
+class Camera:
+    def __init__(self):
+        self.target = Point3D()
+        self.eye = Point3D(0.0, 0.0, 10.0)
+        self.upVector = Vector3D(0.0, 1.0, 0.0)
+        self.isFitView = False
+        self.isSmoothTransition = True
+
+    def copy(self):
+        camera = Camera()
+        camera.target = self.target.copy()
+        camera.eye = self.eye.copy()
+        camera.upVector = self.upVector.copy()
+        camera.isFitView = self.isFitView
+        camera.isSmoothTransition = self.isSmoothTransition
+        return camera
+
+
+@functools.lru_cache(maxsize=256)
+def _png_bytes(width, height, rgb):
+    row = b'\x00' + bytes(rgb) * width
+    raw = row * height
+
+    def chunk(tag, data):
+        body = tag + data
+        return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body) & 0xffffffff)
+
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw))
+            + chunk(b'IEND', b''))
+
+
+class Viewport:
+    def __init__(self):
+        self._camera = Camera()
+        self.render_delay = 0.0
+        self.refresh_count = 0
+        self.saved_images = 0
+
+    @property
+    def camera(self):
+        return self._camera.copy()
+
+    @camera.setter
+    def camera(self, value):
+        self._camera = value.copy()
+
+    def refresh(self):
+        self.refresh_count += 1
+
+    def saveAsImageFile(self, filename, width, height):
+        if self.render_delay:
+            time.sleep(self.render_delay)
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # A small palette keeps the encoded images cacheable across shots.
+        seed = zlib.crc32(os.path.basename(filename).encode('utf-8')) % 64
+        rgb = ((seed & 3) * 85, ((seed >> 2) & 3) * 85, ((seed >> 4) & 3) * 85)
+        with open(filename, 'wb') as f:
+            f.write(_png_bytes(width, height, rgb))
+        self.saved_images += 1
+        return True
+
+
+class ListItem:
+    def __init__(self, name, is_selected=True):
+        self.name = name
+        self.isSelected = is_selected
+
+
+class ListControlDefinition:
+    def __init__(self, items):
+        self.listItems = ObjectCollection(items)
+
+    @staticmethod
+    def cast(obj):
+        return obj if isinstance(obj, ListControlDefinition) else None
+
+
+class CommandDefinition:
+    def __init__(self, id, control_definition):
+        self.id = id
+        self.controlDefinition = control_definition
+
+
+class CommandDefinitions(ObjectCollection):
+    def itemById(self, id):
+        for definition in self._items:
+            if definition.id == id:
+                return definition
+        return None
+
+
+class FileDialog:
+    def __init__(self, ui):
+        self._ui = ui
+        self.isMultiSelectEnabled = False
+        self.title = ''
+        self.filter = ''
+        self.filterIndex = 0
+        self.initialFilename = ''
+        self.filename = ''
+
+    def showSave(self):
+        if not self._ui.save_filename:
+            return DialogResults.DialogCancel
+        self.filename = self._ui.save_filename
+        return DialogResults.DialogOK
+
+
+class UserInterface:
+    def __init__(self):
+        grid = ListControlDefinition([ListItem('Layout Grid', True)])
+        self.commandDefinitions = CommandDefinitions([CommandDefinition('ViewLayoutGridCommand', grid)])
+        self.messages = []
+        self.save_filename = None
+
+    def messageBox(self, text, title='', *args):
+        self.messages.append(text)
+        return DialogResults.DialogOK
+
+    def createFileDialog(self):
+        return FileDialog(self)
+
+
+class Application:
+    _instance = None
+
+    def __init__(self):
+        self.userInterface = UserInterface()
+        self.activeProduct = None
+        self.activeViewport = Viewport()
+        self.log_messages = collections.deque(maxlen=1000)
+        self.log_count = 0
+
+    @staticmethod
+    def get():
+        if Application._instance is None:
+            Application._instance = Application()
+        return Application._instance
+
+    @staticmethod
+    def reset():
+        Application._instance = Application()
+        return Application._instance
+
+    def log(self, message, *args):
+        self.log_messages.append(message)
+        self.log_count += 1
@@ -0,0 +1,138 @@
+import itertools
+
+from .core import ObjectCollection, Point3D, Vector3D, Matrix3D
+
+
+_ids = itertools.count(1)
+_occurrence_ids = itertools.count(1)
+
+
+class Material:
+    def __init__(self, name):
+        self.name = name
+
+
+class Appearance:
+    def __init__(self, name):
+        self.name = name
+
+
+class BoundingBox3D:
+    def __init__(self, minPoint, maxPoint):
+        self.minPoint = minPoint
+        self.maxPoint = maxPoint
+
+
+class BRepBody:
+    def __init__(self, volume=1.0, is_solid=True, size=1.0):
+        self.volume = volume
+        self.isSolid = is_solid
+        self.boundingBox = BoundingBox3D(Point3D(0.0, 0.0, 0.0), Point3D(size, size, size))
+        self.appearance = Appearance('Default')
+
+
+class BRepBodies(ObjectCollection):
+    pass
+
+
+class OccurrenceList(ObjectCollection):
+    pass
+
+
+class Occurrences(ObjectCollection):
+    pass
+
+
+class Occurrence:
+    def __init__(self, component, translation, assembly_context=None, native=None):
+        self.component = component
+        self.transform = Matrix3D(translation)
+        # Appearance override; None shows the bodies' own appearances
+        self.appearance = None
+        self.assemblyContext = assembly_context
+        self.nativeObject = native
+        self.isReferencedComponent = component.is_referenced
+        self.isLightBulbOn = True
+        self.isIsolated = False
+        self.name = native.name if native is not None else '%s:%d' % (component.name, next(_occurrence_ids))
+        self.fullPathName = assembly_context.fullPathName + '+' + self.name if assembly_context else self.name
+
+
+class Components(ObjectCollection):
+    def __init__(self, items=None):
+        super().__init__(items)
+        self._by_id = {comp.id: comp for comp in self._items}
+
+    def itemById(self, id):
+        return self._by_id.get(id)
+
+
+class Component:
+    def __init__(self, name, bodies=(), material=None, is_referenced=False):
+        self.id = 'comp-%06d' % next(_ids)
+        self.entityToken = 'token/' + self.id
+        self.name = name
+        self.material = material
+        self.bRepBodies = BRepBodies(bodies)
+        self.isBodiesFolderLightBulbOn = True
+        self.is_referenced = is_referenced
+        self.parentDesign = None
+        self._children = []
+        self._all = None
+        self._by_component = None
+
+    def add_occurrence(self, component, translation=(0.0, 0.0, 0.0)):
+        occ = Occurrence(component, Vector3D(*translation))
+        self._children.append(occ)
+        self._all = None
+        self._by_component = None
+        return occ
+
+    @property
+    def occurrences(self):
+        return Occurrences(self._children)
+
+    def _flatten(self, context, offset):
+        for native in self._children:
+            t = native.transform.translation
+            proxy = Occurrence(native.component,
+                               Vector3D(offset.x + t.x, offset.y + t.y, offset.z + t.z),
+                               context, native)
+            yield proxy
+            yield from native.component._flatten(proxy, proxy.transform.translation)
+
+    @property
+    def allOccurrences(self):
+        if self._all is None:
+            self._all = list(self._flatten(None, Vector3D()))
+        return OccurrenceList(self._all)
+
+    def allOccurrencesByComponent(self, component):
+        if self._by_component is None:
+            self._by_component = {}
+            for occ in self.allOccurrences:
+                self._by_component.setdefault(occ.component.id, []).append(occ)
+        return OccurrenceList(self._by_component.get(component.id, []))
+
+
+class DataFile:
+    def __init__(self, version_number):
+        self.versionNumber = version_number
+
+
+class Document:
+    def __init__(self, data_file=None):
+        self.dataFile = data_file
+
+
+class Design:
+    def __init__(self, root, components, version_number=None):
+        self.rootComponent = root
+        self.allComponents = Components(components)
+        self.parentDocument = Document(DataFile(version_number) if version_number is not None else None)
+        for comp in components:
+            comp.parentDesign = self
+
+    @staticmethod
+    def cast(obj):
+        return obj if isinstance(obj, Design) else None
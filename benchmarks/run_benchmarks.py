@@ -0,0 +1,306 @@
+"""
+Time the export phases against synthetic assemblies, outside Fusion.
+
+    python benchmarks/run_benchmarks.py --sizes 1k 10k --output results.json
+    python benchmarks/run_benchmarks.py --compare before.json --output after.json
+    python benchmarks/run_benchmarks.py --compare before.json --fail-on-api-growth
+
+The offline ``adsk`` stand-in in ``benchmarks/fake_adsk`` replaces the Fusion
+API, so the numbers measure the exporter's own Python work and its number of
+round trips rather than real rendering time. Each size also records the number
+of object model calls per export phase (``countApiCalls``).
+
+Every run also checks that moving a child occurrence inside a sub-assembly
+re-renders the thumbnails of that assembly and of the assemblies above it, both
+through the thumbnail cache and with ``incrementalExport``, and exits with
+status 1 when it does not. An export that reports an error fails the run.
+"""
+import argparse, datetime, json, os, platform, shutil, statistics, subprocess, sys, tempfile, time, types, importlib
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, 'fake_adsk'))
+sys.path.insert(0, BENCH_DIR)
+
+import adsk.core, adsk.fusion
+import synthetic
+
+
+def load_script(package='ExportBOM'):
+    """Import the script folder as a package so its relative imports resolve."""
+    if package not in sys.modules:
+        module = types.ModuleType(package)
+        module.__path__ = [SCRIPT_DIR]
+        sys.modules[package] = module
+    return importlib.import_module(package + '.ExportBOM'), importlib.import_module(package + '.BOMExporterClass')
+
+
+def timed(func, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    return {'min': min(runs), 'median': statistics.median(runs), 'runs': runs}
+
+
+def collect(script, classes, design):
+    exporter = classes.BOMExporter(script.includeVolume)
+    aggregator = classes.BomAggregator(script.includeVolume, design.allComponents.itemById)
+    for occ in design.rootComponent.allOccurrences:
+        comp = occ.component
+        if comp is None or not comp.name:
+            continue
+        exporter.index_occurrence(occ, aggregator.add(comp))
+    return exporter, aggregator.rows()
+
+
+def collect_definitions(script, classes, design):
+    aggregator = classes.BomAggregator(script.includeVolume, design.allComponents.itemById)
+    aggregator.add_tree(design.rootComponent)
+    return aggregator.rows()
+
+
+def collect_indented(script, classes, design):
+    aggregator = classes.BomAggregator(script.includeVolume, design.allComponents.itemById)
+    aggregator.add_tree(design.rootComponent)
+    return aggregator.indented_rows(design.rootComponent)
+
+
+def run_script(script):
+    """Run the export once and fail if it reported an error instead of finishing."""
+    messages = adsk.core.Application.get().userInterface.messages
+    del messages[:]
+    script.run(None)
+    if messages:
+        raise AssertionError(f"the export reported: {messages}")
+
+
+def ancestor_ids(design, component):
+    """Return the ids of the components above `component` in `design`, without the root."""
+    parents = {}
+    for comp in design.allComponents:
+        for occ in comp.occurrences:
+            parents.setdefault(occ.component.id, set()).add(comp)
+    found = set()
+    pending = [component]
+    while pending:
+        for parent in parents.get(pending.pop().id, ()):
+            if parent is not design.rootComponent and parent.id not in found:
+                found.add(parent.id)
+                pending.append(parent)
+    return found
+
+
+def bench_size(script, classes, size, repeat, workdir):
+    design = synthetic.build_preset(size, referenced_every=3)
+    app = adsk.core.Application.get()
+    root = design.rootComponent
+    base = os.path.join(workdir, size)
+    os.makedirs(base, exist_ok=True)
+    filename = os.path.join(base, 'Root.html')
+    app.userInterface.save_filename = filename
+    file_base = os.path.splitext(filename)[0]
+    image_dir = file_base + '_files'
+
+    timings = {}
+    script.thumbnailCacheDirectory = None
+    timings['run'] = timed(lambda: run_script(script), repeat)
+    script.thumbnailCacheDirectory = os.path.join(base, 'thumbnail-cache')
+    run_script(script)
+    timings['run_warm_cache'] = timed(lambda: run_script(script), repeat)
+    script.thumbnailCacheDirectory = None
+    script.countApiCalls = True
+    try:
+        run_script(script)
+    finally:
+        script.countApiCalls = False
+    with open(file_base + '_api_calls.json', encoding='utf-8') as f:
+        api_calls = {phase: entry['calls'] for phase, entry in json.load(f)['totals'].items()}
+    timings['collection'] = timed(lambda: collect(script, classes, design), repeat)
+    timings['collection_definitions'] = timed(lambda: collect_definitions(script, classes, design), repeat)
+    timings['collection_multilevel'] = timed(lambda: collect_indented(script, classes, design), repeat)
+
+    exporter, bom = collect(script, classes, design)
+
+    def take_images():
+        for item in bom:
+            exporter.take_image(app, app.userInterface, item.component, None, image_dir)
+
+    def take_images_in_session():
+        visibility = classes.VisibilityManager(root.occurrences)
+        try:
+            with classes.RenderSession(app, app.userInterface) as session:
+                for item, component in exporter.capture_order(bom):
+                    exporter.take_image(app, app.userInterface, component, None, image_dir, visibility, session)
+        finally:
+            visibility.restore()
+
+    timings['take_image'] = timed(take_images, repeat)
+    timings['take_image_session'] = timed(take_images_in_session, repeat)
+    timings['build_csv'] = timed(lambda: exporter.build_csv(bom, image_dir, file_base + '_bom'), repeat)
+    timings['build_html_with_images'] = timed(
+        lambda: exporter.build_html_with_images(app, bom, image_dir, file_base + '_html', editable=False), repeat)
+    timings['buildHTMLWithImagesEditableCSV'] = timed(
+        lambda: exporter.buildHTMLWithImagesEditableCSV(app, bom, image_dir, file_base + '_html', editable=True), repeat)
+    timings['report_pipeline'] = timed(lambda: exporter.report_pipeline(image_dir, file_base).run(bom), repeat)
+
+
+    def build_atlas_html():
+        atlas_exporter = classes.BOMExporter(script.includeVolume, image_mode='atlas')
+        atlas_exporter.build_html_with_images(app, bom, image_dir, file_base + '_atlas', editable=False)
+
+    timings['build_html_with_images_atlas'] = timed(build_atlas_html, repeat)
+
+    def build_streamed_html():
+        streamed_exporter = classes.BOMExporter(script.includeVolume, image_mode='inline_streamed')
+        streamed_exporter.build_html_with_images(app, bom, image_dir, file_base + '_streamed', editable=False)
+
+    timings['build_html_with_images_streamed'] = timed(build_streamed_html, repeat)
+
+    def build_virtual_report():
+        virtual_exporter = classes.BOMExporter(script.includeVolume, editable_report='virtual')
+        virtual_exporter.report_pipeline(image_dir, file_base + '_virtual').run(bom)
+
+    timings['report_pipeline_virtual'] = timed(build_virtual_report, repeat)
+
+    return {
+        'occurrences': root.allOccurrences.count,
+        'unique_components': len(bom),
+        'timings': timings,
+        'api_calls': api_calls,
+    }
+
+
+def check_moved_child(script, classes, workdir):
+    """
+    Move one child occurrence inside a sub-assembly between two exports, with
+    the thumbnail cache and with incrementalExport. Both must re-render the
+    sub-assembly's thumbnail and those of the assemblies above it instead of
+    reusing the stale ones. Returns, per mode, the number of images rendered
+    by the second export and the expected images that were not.
+    """
+    captured = []
+    capture = classes.RenderSession.capture
+
+    def recorded_capture(session, camera_target, image_path):
+        captured.append(os.path.basename(image_path))
+        return capture(session, camera_target, image_path)
+
+    result = {}
+    settings = (script.thumbnailCacheDirectory, script.incrementalExport)
+    classes.RenderSession.capture = recorded_capture
+    try:
+        for mode in ('thumbnail_cache', 'incremental'):
+            # Three levels deep, so the moved assembly has another one above it
+            design = synthetic.build_preset('10k')
+            base = os.path.join(workdir, 'moved-child-' + mode)
+            os.makedirs(base, exist_ok=True)
+            adsk.core.Application.get().userInterface.save_filename = os.path.join(base, 'Root.html')
+            script.thumbnailCacheDirectory = os.path.join(base, 'thumbnail-cache') if mode == 'thumbnail_cache' else None
+            script.incrementalExport = mode == 'incremental'
+            run_script(script)
+
+            assembly, ancestors = max(((comp, ancestor_ids(design, comp)) for comp in design.allComponents
+                                       if comp is not design.rootComponent and comp.occurrences.count),
+                                      key=lambda pair: len(pair[1]))
+            assembly.occurrences.item(0).transform.translation.x += 5.0
+            captured.clear()
+            run_script(script)
+            expected = {assembly.id} | ancestors
+            result[mode] = {'rendered': len(captured),
+                            'missing': sorted(f'{comp_id}.png' for comp_id in expected
+                                              if f'{comp_id}.png' not in captured)}
+    finally:
+        classes.RenderSession.capture = capture
+        script.thumbnailCacheDirectory, script.incrementalExport = settings
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous, current):
+    """Return the report lines and the API call counts that grew, as (size, phase, before, after)."""
+    lines = []
+    grown = []
+    for size, result in current['results'].items():
+        old = previous.get('results', {}).get(size)
+        if not old:
+            continue
+        for name, timing in result['timings'].items():
+            before = old['timings'].get(name)
+            if not before or not before['min']:
+                continue
+            ratio = timing['min'] / before['min']
+            lines.append(f"{size:>5} {name:<32} {before['min'] * 1000:10.2f} ms -> {timing['min'] * 1000:10.2f} ms  x{ratio:.2f}")
+        for phase, calls in result.get('api_calls', {}).items():
+            before = old.get('api_calls', {}).get(phase)
+            if before is None:
+                continue
+            lines.append(f"{size:>5} {'api calls: ' + phase:<32} {before:13d} -> {calls:13d}")
+            if calls > before:
+                grown.append((size, phase, before, calls))
+    return '\n'.join(lines), grown
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=list(synthetic.PRESETS), choices=list(synthetic.PRESETS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='Earlier results file to print the change against.')
+    parser.add_argument('--fail-on-api-growth', action='store_true',
+                        help='Exit with status 1 when a phase makes more API calls than in the --compare file.')
+    args = parser.parse_args(argv)
+
+    script, classes = load_script()
+    workdir = tempfile.mkdtemp(prefix='exportbom-bench-')
+    try:
+        results = {}
+        for size in args.sizes:
+            results[size] = bench_size(script, classes, size, args.repeat, workdir)
+            print(f"{size}: {results[size]['occurrences']} occurrences, "
+                  f"run {results[size]['timings']['run']['min'] * 1000:.1f} ms")
+        moved_child = check_moved_child(script, classes, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'repeat': args.repeat,
+        },
+        'results': results,
+        'checks': {'moved_child_rendered': moved_child},
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    stale = [mode for mode, check in moved_child.items() if check['missing']]
+    for mode in stale:
+        print(f"{mode}: moving a child occurrence did not re-render {', '.join(moved_child[mode]['missing'])}",
+              file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            text, grown = compare(json.load(f), report)
+        print(text)
+        if grown and args.fail_on_api_growth:
+            for size, phase, before, calls in grown:
+                print(f"{size}: {phase} makes {calls} API calls, {before} before", file=sys.stderr)
+            return 1
+    if stale:
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""
+Synthetic assemblies built on the offline ``adsk`` stand-in.
+
+Every level of the tree holds ``width`` distinct sub-assemblies, each placed
+``instances`` times inside every parent, so the flattened occurrence count
+grows as ``(width * instances) ** depth`` while the number of unique
+components stays at ``width * depth``.
+"""
+import adsk.core, adsk.fusion
+
+MATERIALS = ['Steel', 'Aluminum 6061', 'ABS Plastic', 'Brass', None]
+
+# name -> (depth, width, instances)
+PRESETS = {
+    '1k': (2, 6, 5),
+    '10k': (3, 4, 5),
+    '100k': (3, 9, 5),
+    # Flat and wide: thousands of unique parts, where per-row lookups hurt most.
+    '10k-wide': (1, 2000, 5),
+}
+
+
+def build_assembly(depth, width, instances, bodies_per_part=2, referenced_every=0, version_number=1):
+    """
+    Build a design, make it the active product and return it.
+
+    :param referenced_every: Mark every n-th sub-assembly as an externally
+        referenced component (0 disables), to exercise that render path.
+    """
+    app = adsk.core.Application.reset()
+    components = []
+    counter = [0]
+
+    def new_component(name, leaf):
+        counter[0] += 1
+        material = MATERIALS[counter[0] % len(MATERIALS)]
+        bodies = [adsk.fusion.BRepBody(volume=1.5 * (i + 1), size=float(i + 1)) for i in range(bodies_per_part)] if leaf else []
+        comp = adsk.fusion.Component(name, bodies,
+                                     adsk.fusion.Material(material) if material else None,
+                                     is_referenced=bool(referenced_every) and not leaf and counter[0] % referenced_every == 0)
+        components.append(comp)
+        return comp
+
+    # Build bottom-up so each level can reuse the definitions below it.
+    below = []
+    for level in range(depth, 0, -1):
+        current = []
+        for w in range(width):
+            comp = new_component('L%d_Part%d' % (level, w), leaf=not below)
+            for child in below:
+                for i in range(instances):
+                    comp.add_occurrence(child, (float(i * 10), float(w), float(level)))
+            current.append(comp)
+        below = current
+
+    root = adsk.fusion.Component('Root')
+    for child in below:
+        for i in range(instances):
+            root.add_occurrence(child, (float(i * 10), 0.0, 0.0))
+    components.insert(0, root)
+
+    design = adsk.fusion.Design(root, components, version_number)
+    app.activeProduct = design
+    return design
+
+
+def build_preset(name, **kwargs):
+    depth, width, instances = PRESETS[name]
+    return build_assembly(depth, width, instances, **kwargs)